@@ -0,0 +1,82 @@
+import math
+import os
+import random
+import string
+import tempfile
+from typing import Dict, List, Optional, Sequence
+
+import database
+from database import content_digest, get_connection, setup_database
+
+class FakeBot:
+    """Minimal stand-in for commands.Bot used by the service singletons"""
+
+    def __init__(self):
+        self.events = []
+
+    def dispatch(self, event: str, *args, **kwargs):
+        self.events.append((event, args, kwargs))
+
+def create_temp_database(path: Optional[str] = None, prefix: str = "shop_bench_") -> str:
+    """Create an empty shop database (in a temp dir by default) and point connections at it"""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix=prefix), 'shop.db')
+    database.set_database_path(path)
+    setup_database()
+    return path
+
+def random_content(length: int = 32) -> str:
+    """Random credential-like stock content"""
+    alphabet = string.ascii_letters + string.digits
+    user = ''.join(random.choices(alphabet, k=length // 2))
+    password = ''.join(random.choices(alphabet, k=length // 2))
+    return f"{user}:{password}"
+
+def seed_shop(products: int, stock: int, users: int, balance: int,
+              price: int = 10, content_length: int = 32) -> Dict[str, List[str]]:
+    """Fill the current database with products, stock rows and funded users"""
+    product_codes = [f"P{i:03d}" for i in range(products)]
+    growids = [f"bench_user_{i:05d}" for i in range(users)]
+
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO products (code, name, price, description) VALUES (?, ?, ?, ?)",
+            [(code, f"Product {code}", price, "Load test product") for code in product_codes]
+        )
+        contents = (f"{i}:{random_content(content_length)}" for i in range(stock))
+        cursor.executemany(
+            "INSERT INTO stock (product_code, content, content_hash, added_by) VALUES (?, ?, ?, 'bench')",
+            (
+                (product_codes[i % products], content, content_digest(content))
+                for i, content in enumerate(contents)
+            )
+        )
+        cursor.executemany(
+            "INSERT INTO users (growid, balance_wl) VALUES (?, ?)",
+            [(growid, balance) for growid in growids]
+        )
+        cursor.executemany(
+            "INSERT INTO user_growid (discord_id, growid) VALUES (?, ?)",
+            [(str(100000 + i), growid) for i, growid in enumerate(growids)]
+        )
+        conn.commit()
+    finally:
+        if conn:
+            conn.close()
+
+    return {
+        'products': product_codes,
+        'growids': growids,
+        'discord_ids': [str(100000 + i) for i in range(users)]
+    }
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
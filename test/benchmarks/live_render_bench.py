@@ -0,0 +1,70 @@
+"""Live stock board render benchmark.
+
+Times building the board (stock snapshot + embed) for growing catalogs, next
+to the old per-product get_stock_count path. Run from the bot directory:
+
+    python -m benchmarks.live_render_bench --sizes 10 50 200 1000 --stock-per-product 200
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from benchmarks.common import FakeBot, create_temp_database, percentile, seed_shop
+from ext.live_service import LiveStockService
+from ext.product_manager import ProductManagerService
+
+async def time_snapshot(service: LiveStockService, repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        products = await service.product_manager.get_stock_snapshot()
+        await service.create_stock_embed(products)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+async def time_per_product(product_manager: ProductManagerService, repeats: int) -> List[float]:
+    """The old board query pattern: product list, then one count query per product"""
+    samples = []
+    for _ in range(repeats):
+        product_manager.invalidate_cache()
+        started = time.perf_counter()
+        products = await product_manager.get_all_products()
+        for product in products:
+            await product_manager.get_stock_count(product['code'])
+        samples.append(time.perf_counter() - started)
+    return samples
+
+async def run(args):
+    bot = FakeBot()
+    service = LiveStockService(bot)
+    print(f"{'products':>8} {'snapshot p50 ms':>16} {'p95 ms':>8} {'per-product p50 ms':>19} {'p95 ms':>8}")
+    for size in args.sizes:
+        create_temp_database(prefix="shop_render_bench_")
+        seed_shop(size, size * args.stock_per_product, 0, 0)
+        service.product_manager.invalidate_cache()
+
+        snapshot = await time_snapshot(service, args.repeats)
+        per_product = await time_per_product(service.product_manager, args.repeats)
+        print(
+            f"{size:>8} "
+            f"{percentile(snapshot, 50) * 1000:>16.2f} {percentile(snapshot, 95) * 1000:>8.2f} "
+            f"{percentile(per_product, 50) * 1000:>19.2f} {percentile(per_product, 95) * 1000:>8.2f}"
+        )
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Live stock board render benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200, 1000])
+    parser.add_argument('--stock-per-product', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=20)
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run(args))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+"""Concurrent purchase load test with oversell detection.
+
+Builds a throwaway shop.db, fires concurrent purchases at it and checks the
+resulting ledger. Run from the bot directory:
+
+    python -m benchmarks.purchase_loadtest --products 5 --stock 5000 --users 500 --purchases 4000
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from benchmarks.common import FakeBot, create_temp_database, percentile, seed_shop
+from database import get_connection
+from ext.constants import STATUS_AVAILABLE, STATUS_SOLD, TRANSACTION_PURCHASE
+from ext.trx import TransactionManager
+
+logger = logging.getLogger("purchase_loadtest")
+
+class _FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.name = f"bench_{user_id}"
+        self.dms = []
+
+    async def send(self, *args, **kwargs):
+        self.dms.append((args, kwargs))
+
+class _FakeResponse:
+    def __init__(self):
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def send_message(self, *args, **kwargs):
+        self._done = True
+
+class _FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append((content, kwargs))
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for BuyModal.on_submit"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, user_id: int):
+        self.id = next(self._ids)
+        self.user = _FakeUser(user_id)
+        self.response = _FakeResponse()
+        self.followup = _FakeFollowup()
+
+    @property
+    def succeeded(self) -> bool:
+        for _, kwargs in self.followup.messages:
+            embed = kwargs.get('embed')
+            if embed is not None and embed.title and 'Purchase Successful' in embed.title:
+                return True
+        return False
+
+class _FakeField:
+    def __init__(self, value: str):
+        self.value = value
+
+class PurchaseLoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.bot = FakeBot()
+        self.trx_manager = TransactionManager(self.bot)
+        self.latencies: List[float] = []
+        self.results: List[Dict] = []
+        self.errors = Counter()
+        self.shop: Dict[str, List[str]] = {}
+
+    def _record_results(self):
+        """Wrap process_purchase so sold items are captured in every mode"""
+        original = self.trx_manager.process_purchase
+
+        async def recording_purchase(*args, **kwargs):
+            result = await original(*args, **kwargs)
+            if result:
+                self.results.append(result)
+            return result
+
+        self.trx_manager.process_purchase = recording_purchase
+
+    async def _purchase_direct(self, growid: str, product_code: str, quantity: int):
+        try:
+            await self.trx_manager.process_purchase(growid, product_code, quantity)
+        except Exception as e:
+            self.errors[str(e)] += 1
+
+    async def _purchase_modal(self, discord_id: str, product_code: str, quantity: int):
+        from ext.live_modals import BuyModal
+
+        interaction = FakeInteraction(int(discord_id))
+        modal = BuyModal(self.bot)
+        modal.code = _FakeField(product_code)
+        modal.quantity = _FakeField(str(quantity))
+        await modal.on_submit(interaction)
+        if not interaction.succeeded:
+            reason = interaction.followup.messages[-1][0] if interaction.followup.messages else "no reply"
+            self.errors[reason] += 1
+
+    async def _run_one(self, semaphore: asyncio.Semaphore, index: int):
+        user_index = random.randrange(len(self.shop['growids']))
+        product_code = random.choice(self.shop['products'])
+        async with semaphore:
+            started = time.perf_counter()
+            if self.args.mode == 'modal':
+                await self._purchase_modal(self.shop['discord_ids'][user_index], product_code, self.args.quantity)
+            else:
+                await self._purchase_direct(self.shop['growids'][user_index], product_code, self.args.quantity)
+            self.latencies.append(time.perf_counter() - started)
+
+    async def run(self) -> bool:
+        path = create_temp_database(self.args.db)
+        self.shop = seed_shop(
+            self.args.products,
+            self.args.stock,
+            self.args.users,
+            self.args.balance,
+            price=self.args.price
+        )
+        logger.info(f"Seeded {path}: {self.args.products} products, {self.args.stock} stock, {self.args.users} users")
+
+        self._record_results()
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(*(self._run_one(semaphore, i) for i in range(self.args.purchases)))
+        elapsed = time.perf_counter() - started
+
+        self._report(elapsed)
+        problems = self.verify()
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if not problems:
+            print("OK: no oversell, balances and counts consistent")
+        return not problems
+
+    def _report(self, elapsed: float):
+        succeeded = len(self.results)
+        print(f"mode={self.args.mode} purchases={self.args.purchases} concurrency={self.args.concurrency}")
+        print(f"succeeded={succeeded} failed={sum(self.errors.values())} elapsed={elapsed:.2f}s")
+        print(f"throughput={succeeded / elapsed if elapsed else 0:.1f} purchases/s")
+        print(
+            "latency ms: "
+            f"p50={percentile(self.latencies, 50) * 1000:.2f} "
+            f"p95={percentile(self.latencies, 95) * 1000:.2f} "
+            f"p99={percentile(self.latencies, 99) * 1000:.2f} "
+            f"max={max(self.latencies, default=0) * 1000:.2f}"
+        )
+        for reason, count in self.errors.most_common(5):
+            print(f"  {count}x {reason}")
+
+    def verify(self) -> List[str]:
+        """Check the ledger for oversell and balance drift"""
+        problems = []
+        sold_ids = [item['id'] for result in self.results for item in result['items']]
+        duplicates = [stock_id for stock_id, count in Counter(sold_ids).items() if count > 1]
+        if duplicates:
+            problems.append(f"{len(duplicates)} stock rows sold more than once (e.g. {duplicates[:5]})")
+
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT COUNT(*) as count FROM stock WHERE status = ?", (STATUS_SOLD,))
+            sold_rows = cursor.fetchone()['count']
+            cursor.execute("SELECT COUNT(*) as count FROM stock WHERE status = ?", (STATUS_AVAILABLE,))
+            available_rows = cursor.fetchone()['count']
+            cursor.execute(
+                "SELECT COUNT(*) as count, COALESCE(SUM(items_count), 0) as items FROM transactions WHERE type = ?",
+                (TRANSACTION_PURCHASE,)
+            )
+            trx = cursor.fetchone()
+
+            if trx['count'] != len(self.results):
+                problems.append(f"{trx['count']} purchase transactions but {len(self.results)} successful purchases")
+            if trx['items'] != sold_rows:
+                problems.append(f"transactions record {trx['items']} items but {sold_rows} stock rows are sold")
+            if len(sold_ids) != sold_rows:
+                problems.append(f"{len(sold_ids)} items delivered but {sold_rows} stock rows are sold")
+            cursor.execute("SELECT COUNT(*) as count, COUNT(DISTINCT stock_id) as distinct_count FROM purchase_items")
+            links = cursor.fetchone()
+            if links['count'] != links['distinct_count']:
+                problems.append(f"{links['count'] - links['distinct_count']} stock rows linked to more than one purchase")
+            if links['count'] != sold_rows:
+                problems.append(f"{links['count']} purchase_items rows but {sold_rows} stock rows are sold")
+            if sold_rows + available_rows != self.args.stock:
+                problems.append(f"sold + available = {sold_rows + available_rows}, expected {self.args.stock}")
+
+            cursor.execute("""
+                SELECT u.growid, u.balance_wl,
+                       COALESCE(SUM(t.total_price), 0) as spent
+                FROM users u
+                LEFT JOIN transactions t ON t.growid = u.growid AND t.type = ?
+                GROUP BY u.growid
+            """, (TRANSACTION_PURCHASE,))
+            drifted = [
+                row['growid'] for row in cursor.fetchall()
+                if row['balance_wl'] != self.args.balance - row['spent']
+            ]
+            if drifted:
+                problems.append(f"{len(drifted)} users have balances that don't match their transactions")
+        finally:
+            if conn:
+                conn.close()
+
+        return problems
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Concurrent purchase load test")
+    parser.add_argument('--products', type=int, default=5)
+    parser.add_argument('--stock', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--balance', type=int, default=1000)
+    parser.add_argument('--price', type=int, default=10)
+    parser.add_argument('--purchases', type=int, default=2500)
+    parser.add_argument('--quantity', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--mode', choices=['trx', 'modal'], default='trx',
+                        help="call process_purchase directly or submit BuyModal with fake interactions")
+    parser.add_argument('--db', help="build the test database at this path instead of a temp dir")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true', help="show service error logs for failed purchases")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.verbose:
+        # Sold-out and insufficient-balance failures are expected under load
+        for name in ("TransactionManager", "BuyModal"):
+            logging.getLogger(name).setLevel(logging.CRITICAL)
+    if args.seed is not None:
+        random.seed(args.seed)
+    ok = asyncio.run(PurchaseLoadTest(args).run())
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
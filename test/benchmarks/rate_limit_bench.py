@@ -0,0 +1,90 @@
+"""Command rate limiter microbenchmark.
+
+Times one rate limit check at growing user counts and request rates, for the
+token bucket RateLimiter next to the old timestamp-list check. Run from the
+bot directory:
+
+    python -m benchmarks.rate_limit_bench --users 100 10000 1000000 --checks 200000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from utils.rate_limiter import RateLimiter
+
+class TimestampListLimiter:
+    """The previous check_rate_limit: timestamp lists rebuilt on every call"""
+
+    def __init__(self, limits):
+        self.rate_limits = limits
+        self.rate_usage = {'global': [], 'user': {}}
+
+    def check(self, user_id, now: datetime) -> bool:
+        self.rate_usage['global'] = [t for t in self.rate_usage['global']
+                                     if (now - t).total_seconds() <= self.rate_limits['global'][1]]
+        if len(self.rate_usage['global']) >= self.rate_limits['global'][0]:
+            return False
+        user_id = str(user_id)
+        if user_id not in self.rate_usage['user']:
+            self.rate_usage['user'][user_id] = []
+        self.rate_usage['user'][user_id] = [t for t in self.rate_usage['user'][user_id]
+                                            if (now - t).total_seconds() <= self.rate_limits['user'][1]]
+        if len(self.rate_usage['user'][user_id]) >= self.rate_limits['user'][0]:
+            return False
+        self.rate_usage['global'].append(now)
+        self.rate_usage['user'][user_id].append(now)
+        return True
+
+def run_token_bucket(limits, users: int, checks: int, rate: float):
+    limiter = RateLimiter(limits)
+    user_ids = [random.randrange(users) for _ in range(checks)]
+    channel_ids = [random.randrange(50) for _ in range(checks)]
+    # Simulated time continues from the clock the limiter's buckets started on
+    base = time.monotonic()
+    step = 1 / rate
+    allowed = 0
+    started = time.perf_counter()
+    for i in range(checks):
+        ok, _ = limiter.check(user_ids[i], channel_ids[i], 'buy', now=base + i * step)
+        allowed += ok
+    elapsed = time.perf_counter() - started
+    return elapsed / checks, allowed, len(limiter.users)
+
+def run_timestamp_list(limits, users: int, checks: int, rate: float):
+    limiter = TimestampListLimiter(limits)
+    user_ids = [random.randrange(users) for _ in range(checks)]
+    base = datetime(2024, 1, 1)
+    step = timedelta(seconds=1 / rate)
+    allowed = 0
+    started = time.perf_counter()
+    for i in range(checks):
+        allowed += limiter.check(user_ids[i], base + i * step)
+    elapsed = time.perf_counter() - started
+    return elapsed / checks, allowed, len(limiter.rate_usage['user'])
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Command rate limiter microbenchmark")
+    parser.add_argument('--users', type=int, nargs='+', default=[100, 10_000, 1_000_000])
+    parser.add_argument('--checks', type=int, default=200_000)
+    parser.add_argument('--rates', type=float, nargs='+', default=[100, 10_000],
+                        help="simulated commands per second")
+    parser.add_argument('--legacy-checks', type=int, default=20_000,
+                        help="checks for the old limiter, which slows down as it grows")
+    args = parser.parse_args(argv)
+
+    limits = {'global': [50_000, 1], 'user': [3, 5], 'channel': [5000, 5], 'commands': {'buy': [50_000, 1]}}
+    print(f"{'users':>9} {'rate/s':>8} {'bucket ns':>10} {'keys':>8} {'list ns':>10} {'keys':>8}")
+    for rate in args.rates:
+        for users in args.users:
+            bucket_cost, _, bucket_keys = run_token_bucket(limits, users, args.checks, rate)
+            list_cost, _, list_keys = run_timestamp_list(limits, users, args.legacy_checks, rate)
+            print(
+                f"{users:>9} {rate:>8.0f} {bucket_cost * 1e9:>10.0f} {bucket_keys:>8} "
+                f"{list_cost * 1e9:>10.0f} {list_keys:>8}"
+            )
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
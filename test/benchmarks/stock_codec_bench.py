@@ -0,0 +1,134 @@
+"""Stock content compression benchmark.
+
+Loads the same stock into a plain and a compressed database and compares
+on-disk size (after VACUUM) and purchase delivery latency. Run from the bot
+directory:
+
+    python -m benchmarks.stock_codec_bench --stock 50000 --deliveries 500
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import string
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.common import FakeBot, create_temp_database, percentile, seed_shop
+from database import get_connection
+from ext.product_manager import ProductManagerService
+from ext.trx import TransactionManager
+
+DOMAINS = ['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com']
+
+class _FakeUser:
+    def __init__(self):
+        self.id = 1
+        self.name = "bench_buyer"
+
+    async def send(self, *args, **kwargs):
+        pass
+
+def account_line(i: int) -> str:
+    """Credential-style stock line with the repetitive layout real stock has"""
+    name = ''.join(random.choices(string.ascii_lowercase, k=random.randint(6, 12)))
+    password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
+    return (
+        f"{name}{i}@{random.choice(DOMAINS)}:{password} | "
+        f"Level: {random.randint(1, 125)} | Gems: {random.randint(0, 100000)} | "
+        f"World Locks: {random.randint(0, 500)} | Verified: {random.choice(['Yes', 'No'])}"
+    )
+
+def database_size(path: str) -> int:
+    conn = None
+    try:
+        conn = get_connection()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+    finally:
+        if conn:
+            conn.close()
+    return os.path.getsize(path)
+
+async def build(args, lines: List[str], compressed: bool) -> Dict:
+    path = create_temp_database(prefix="shop_codec_bench_")
+    shop = seed_shop(1, 0, 1, 0)
+    bot = FakeBot()
+    service = ProductManagerService(bot)
+    service._codec = None
+
+    if compressed:
+        # Train on a sample first so the bulk load already uses the dictionary
+        sample = lines[:args.sample]
+        await service.add_stock_bulk(shop['products'][0], sample, 'bench')
+        await service.set_stock_compression(True)
+        await service.train_stock_dictionary(args.sample)
+        await service.compress_existing_stock()
+        await service.add_stock_bulk(shop['products'][0], lines[args.sample:], 'bench')
+    else:
+        await service.add_stock_bulk(shop['products'][0], lines, 'bench')
+
+    stats = await service.get_stock_codec_stats()
+    size = database_size(path)
+
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, content FROM stock ORDER BY RANDOM() LIMIT ?", (args.deliveries * args.quantity,))
+        rows = [dict(row) for row in cursor.fetchall()]
+    finally:
+        if conn:
+            conn.close()
+
+    trx_manager = TransactionManager(bot)
+    user = _FakeUser()
+    latencies = []
+    for start in range(0, len(rows), args.quantity):
+        started = time.perf_counter()
+        await trx_manager.send_purchase_result(user, rows[start:start + args.quantity], "Bench Product")
+        latencies.append(time.perf_counter() - started)
+
+    return {'size': size, 'stats': stats, 'latencies': latencies}
+
+def report(label: str, result: Dict):
+    latencies = result['latencies']
+    stats = result['stats']
+    print(
+        f"{label:<11} db={result['size'] / 1024 / 1024:8.2f} MB "
+        f"content={stats['stored_bytes'] / 1024 / 1024:8.2f} MB "
+        f"compressed_rows={stats['compressed_rows']:,} "
+        f"delivery ms p50={percentile(latencies, 50) * 1000:.3f} "
+        f"p99={percentile(latencies, 99) * 1000:.3f}"
+    )
+
+async def run(args):
+    lines = [account_line(i) for i in range(args.stock)]
+    plain = await build(args, lines, compressed=False)
+    compressed = await build(args, lines, compressed=True)
+
+    report("plain", plain)
+    report("compressed", compressed)
+    if plain['size']:
+        print(f"size ratio: {compressed['size'] / plain['size']:.2%} of plain")
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Stock compression size and latency benchmark")
+    parser.add_argument('--stock', type=int, default=20000)
+    parser.add_argument('--sample', type=int, default=2000, help="rows used to train the dictionary")
+    parser.add_argument('--deliveries', type=int, default=200)
+    parser.add_argument('--quantity', type=int, default=5, help="items per delivery")
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.seed is not None:
+        random.seed(args.seed)
+    asyncio.run(run(args))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
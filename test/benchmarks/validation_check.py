@@ -0,0 +1,89 @@
+"""Stock validation path check.
+
+Runs every rule type over the same generated lines through both
+StockValidator paths, pandas string operations and precompiled patterns,
+and reports any line where they disagree along with the time each path
+took. Exits non-zero on a mismatch. Needs pandas; run from the bot
+directory:
+
+    python -m benchmarks.validation_check --lines 100000
+"""
+import argparse
+import random
+import string
+import time
+from typing import Dict, List, Optional
+
+from ext.constants import RULE_REGEX, RULE_FIELDS, RULE_LENGTH, RULE_ACTION_REJECT
+from ext.stock_validation import StockValidator, describe_rule, pd
+
+SEPARATORS = [':', '|', '.', '\t', '::']
+
+def make_rules() -> List[Dict]:
+    """One rule per type and separator, with regex metacharacters on purpose"""
+    specs = [
+        (RULE_REGEX, r'[^:\s]+:[^:\s]+', None, None, None),
+        (RULE_REGEX, r'\S+@\S+\.\S+(:.*)?', None, None, None),
+        (RULE_LENGTH, None, None, 5, 40),
+        (RULE_LENGTH, None, None, None, 10),
+    ]
+    specs += [(RULE_FIELDS, None, separator, 2, 3) for separator in SEPARATORS]
+    return [
+        {'id': i, 'rule_type': rule_type, 'pattern': pattern, 'separator': separator,
+         'min_value': low, 'max_value': high, 'action': RULE_ACTION_REJECT}
+        for i, (rule_type, pattern, separator, low, high) in enumerate(specs, 1)
+    ]
+
+def make_lines(count: int) -> List[str]:
+    """Credential-like lines mixed with edge cases: empty fields, unicode, stray separators"""
+    alphabet = string.ascii_letters + string.digits + ' .|:@\té€'
+    edge = ['', ':', '::', 'a:', ':b', 'a::b', 'user@mail.com:pw', 'x|y|z|w', 'ünïcødé:pässwörd', ' a:b ', 'a.b.c']
+    lines = []
+    for _ in range(count):
+        if random.random() < 0.1:
+            lines.append(random.choice(edge))
+        else:
+            lines.append(''.join(random.choices(alphabet, k=random.randint(0, 48))))
+    return lines
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stock validation path check")
+    parser.add_argument('--lines', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if pd is None:
+        print("pandas is not installed; only the pure Python path is available")
+        return 0
+
+    random.seed(args.seed)
+    rules = make_rules()
+    lines = make_lines(args.lines)
+    validator = StockValidator(rules)
+    series = pd.Series(lines, dtype=object)
+
+    mismatches = 0
+    print(f"{'rule':<40} {'python ms':>10} {'pandas ms':>10} {'mismatches':>11}")
+    for rule in rules:
+        started = time.perf_counter()
+        expected = validator._check_python(rule, lines)
+        python_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        actual = validator._check_pandas(rule, series)
+        pandas_ms = (time.perf_counter() - started) * 1000
+
+        differing = [i for i, (a, b) in enumerate(zip(expected, actual)) if bool(a) != bool(b)]
+        differing += list(range(min(len(expected), len(actual)), max(len(expected), len(actual))))
+        mismatches += len(differing)
+        print(f"{describe_rule(rule):<40.40} {python_ms:>10.1f} {pandas_ms:>10.1f} {len(differing):>11}")
+        for i in differing[:5]:
+            print(f"    {lines[i]!r}: python={expected[i]} pandas={actual[i]}")
+
+    if mismatches:
+        print(f"FAIL: {mismatches} disagreements between the pandas and python paths")
+        return 1
+    print("OK: both paths agree")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,11 +4,12 @@ import logging
 from datetime import datetime, timedelta
 import json
 import asyncio
-from typing import Optional, List
+from typing import Optional
 import io
 import psutil
 import platform
 import aiohttp
+import os
 from database import get_connection
 
 from ext.constants import (
@@ -16,12 +17,25 @@ from ext.constants import (
     TRANSACTION_ADMIN_ADD,
     TRANSACTION_ADMIN_REMOVE,
     TRANSACTION_ADMIN_RESET,
-    MAX_STOCK_FILE_SIZE,
-    VALID_STOCK_FORMATS
+    STATUS_AVAILABLE,
+    STATUS_SOLD,
+    STATUS_DELETED,
+    EXPORT_DEFAULT_UPLOAD_LIMIT,
+    RULE_REGEX,
+    RULE_FIELDS,
+    RULE_ACTION_REJECT,
+    RULE_ACTION_QUARANTINE,
+    OUTBOUND_BROADCAST,
+    OUTBOUND_PRIORITIES
 )
 from ext.balance_manager import BalanceManagerService
 from ext.product_manager import ProductManagerService
 from ext.trx import TransactionManager
+from ext.stock_import import StockImportManager, StockFileReader
+from ext.export import write_csv_gz
+from ext.stock_validation import describe_rule
+from ext.outbound import OutboundDispatcher
+from utils.cooldowns import get_cooldown_store
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +48,8 @@ class AdminCog(commands.Cog, name="Admin"):
         self.balance_service = BalanceManagerService(bot)
         self.product_service = ProductManagerService(bot)
         self.trx_manager = TransactionManager(bot)
+        self.import_manager = StockImportManager(bot)
+        self.outbound = OutboundDispatcher(bot)
         
         # Load admin configuration
         try:
@@ -53,24 +69,6 @@ class AdminCog(commands.Cog, name="Admin"):
             self.logger.warning(f"Unauthorized access attempt by {ctx.author} (ID: {ctx.author.id})")
         return is_admin
 
-    async def _process_stock_file(self, attachment) -> List[str]:
-        """Process uploaded stock file"""
-        if attachment.size > MAX_STOCK_FILE_SIZE:
-            raise ValueError(f"File too large! Maximum size is {MAX_STOCK_FILE_SIZE/1024:.0f}KB")
-            
-        file_ext = attachment.filename.split('.')[-1].lower()
-        if file_ext not in VALID_STOCK_FORMATS:
-            raise ValueError(f"Invalid file format! Supported formats: {', '.join(VALID_STOCK_FORMATS)}")
-            
-        content = await attachment.read()
-        text = content.decode('utf-8').strip()
-        
-        items = [line.strip() for line in text.split('\n') if line.strip()]
-        if not items:
-            raise ValueError("No valid items found in file!")
-            
-        return items
-
     async def _confirm_action(self, ctx, message: str, timeout: int = 30) -> bool:
         """Get confirmation for dangerous actions"""
         confirm_msg = await ctx.send(
@@ -110,7 +108,16 @@ class AdminCog(commands.Cog, name="Admin"):
                     "`addproduct <code> <name> <price> [description]`\nAdd new product",
                     "`editproduct <code> <field> <value>`\nEdit product details",
                     "`deleteproduct <code>`\nDelete product",
-                    "`addstock <code>`\nAdd stock with file attachment"
+                    "`addstock <code>`\nAdd stock with a .txt, .txt.gz or .zip attachment",
+                    "`preflight`\nCount stock already stored from an attached file",
+                    "`rule add <code> regex <pattern> [reject/quarantine]`\nRequire lines to match a regex",
+                    "`rule add <code> fields <separator> <min> [max] [reject/quarantine]`\nBound the field count",
+                    "`rule add <code> length <min> <max> [reject/quarantine]`\nBound the line length",
+                    "`rule list <code>` / `rule remove <id>`\nShow or remove validation rules",
+                    "`quarantine <code> [clear]`\nShow or clear quarantined stock lines",
+                    "`importjobs [limit]`\nShow stock import jobs",
+                    "`cancelimport <job_id>`\nCancel a running stock import",
+                    "`stockcodec <status/on/off/train/compress>`\nManage stock content compression"
                 ],
                 "Balance Management": [
                     "`addbal <growid> <amount> <WL/DL/BGL>`\nAdd balance",
@@ -120,10 +127,17 @@ class AdminCog(commands.Cog, name="Admin"):
                 ],
                 "Transaction Management": [
                     "`trxhistory <growid> [limit]`\nView transactions",
-                    "`stockhistory <code> [limit]`\nView stock history"
+                    "`stockhistory <code> [limit]`\nView stock history",
+                    "`bulkrefund <code|all> [from] [to]`\nRefund purchases of a product in a date range",
+                    "`bulkrefund ids <id,id,...>`\nRefund specific purchase transactions",
+                    "`export stock <code|all> [status]`\nExport stock as gzipped CSV",
+                    "`export transactions [from] [to]`\nExport transactions as gzipped CSV"
                 ],
                 "System Management": [
                     "`systeminfo`\nShow bot system information",
+                    "`outbound`\nShow outbound Discord queue depth and latency",
+                    "`cmdstats [days] [command]`\nShow command usage since start and from history",
+                    "`reloadperms`\nReload role permissions from config.json and the database",
                     "`announcement <message>`\nSend announcement to all users",
                     "`maintenance <on/off>`\nToggle maintenance mode",
                     "`blacklist <add/remove> <growid>`\nManage blacklisted users",
@@ -186,6 +200,7 @@ class AdminCog(commands.Cog, name="Admin"):
             await ctx.send("❌ Please attach a text file containing the stock items!")
             return
 
+        status_msg = None
         try:
             # Verify product exists
             product = await self.product_service.get_product(code)  # Removed ()
@@ -193,45 +208,246 @@ class AdminCog(commands.Cog, name="Admin"):
                 await ctx.send(f"❌ Product code `{code}` not found!")
                 return
             
-            # Process stock file
-            items = await self._process_stock_file(ctx.message.attachments[0])
-            
-            # Add stock with progress updates
-            progress_msg = await ctx.send("⏳ Adding stock items...")
-            added_count = 0
-            failed_count = 0
-            
-            for i, item in enumerate(items, 1):
-                try:
-                    await self.product_service.add_stock_item(
-                        code,  # Removed ()
-                        item,
-                        str(ctx.author.id)
-                    )
-                    added_count += 1
-                except:
-                    failed_count += 1
-                
-                if i % 10 == 0:  # Update progress every 10 items
-                    await progress_msg.edit(content=f"⏳ Processing... {i}/{len(items)} items")
+            # Import runs in the background; the job edits the status message as it goes
+            attachment = ctx.message.attachments[0]
+            status_msg = await ctx.send(f"⏳ Queuing import of `{attachment.filename}` into {code}...")
+            job_id = await self.import_manager.create_job(code, ctx.message, str(ctx.author.id), status_msg)
+            await status_msg.edit(
+                content=f"⏳ Import #{job_id} of `{attachment.filename}` into {code} started. "
+                        f"Use `{ctx.prefix}cancelimport {job_id}` to stop it."
+            )
+            self.import_manager.start_job(job_id, attachment)
+            self.logger.info(f"Stock import #{job_id} for {code} started by {ctx.author}")
             
+        except Exception as e:
+            if status_msg:
+                await status_msg.edit(content=f"❌ Error: {str(e)}")
+            else:
+                await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error adding stock: {e}")
+
+    @commands.command(name="preflight")
+    async def preflight(self, ctx):
+        """Check an attached stock file for content that is already stored"""
+        if not await self._check_admin(ctx):
+            return
+
+        if not ctx.message.attachments:
+            await ctx.send("❌ Please attach a text file containing the stock items!")
+            return
+
+        try:
+            reader = StockFileReader(self.bot, ctx.message.attachments[0])
+            progress_msg = await ctx.send("⏳ Checking file against stock...")
+            result = await self.product_service.preflight_stock(reader.lines())
+
             embed = discord.Embed(
-                title="✅ Stock Added",
-                color=discord.Color.green(),
+                title="🔎 Stock Preflight",
+                color=discord.Color.blue(),
                 timestamp=datetime.utcnow()
             )
-            embed.add_field(name="Product", value=f"{product['name']} ({code})", inline=False)
-            embed.add_field(name="Total Items", value=len(items), inline=True)
-            embed.add_field(name="Added", value=added_count, inline=True)
-            embed.add_field(name="Failed", value=failed_count, inline=True)
-            
+            embed.add_field(name="File", value=reader.filename, inline=False)
+            embed.add_field(name="Lines", value=f"{result['total']:,}", inline=True)
+            embed.add_field(name="New", value=f"{result['new']:,}", inline=True)
+            embed.add_field(name="Already Stored", value=f"{result['duplicates']:,}", inline=True)
+            embed.add_field(
+                name="Filter",
+                value=f"{result['probable_duplicates']:,} hits, ~{result['error_rate']:.2%} false positive rate",
+                inline=False
+            )
+            embed.set_footer(text=f"Checked in {result['elapsed'] * 1000:.0f}ms")
+
             await progress_msg.delete()
             await ctx.send(embed=embed)
-            self.logger.info(f"Stock added for {code} by {ctx.author}: {added_count} success, {failed_count} failed")
-            
+
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
-            self.logger.error(f"Error adding stock: {e}")
+            self.logger.error(f"Error in stock preflight: {e}")
+
+    @commands.command(name="rule")
+    async def rule(self, ctx, action: str, *args: str):
+        """Manage per-product stock validation rules"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            action = action.lower()
+            if action == 'add' and len(args) >= 3:
+                code, rule_type, params = args[0], args[1].lower(), list(args[2:])
+                rule_action = RULE_ACTION_QUARANTINE
+                if params[-1].lower() in (RULE_ACTION_REJECT, RULE_ACTION_QUARANTINE) and len(params) > 1:
+                    rule_action = params.pop().lower()
+
+                fields = {}
+                if rule_type == RULE_REGEX:
+                    fields['pattern'] = ' '.join(params)
+                else:
+                    if rule_type == RULE_FIELDS:
+                        fields['separator'] = params.pop(0)
+                    bounds = [int(value) for value in params]
+                    fields['min_value'] = bounds[0] if bounds else None
+                    fields['max_value'] = bounds[1] if len(bounds) > 1 else None
+
+                rule = await self.product_service.add_validation_rule(
+                    code, rule_type, action=rule_action, created_by=str(ctx.author.id), **fields
+                )
+                await ctx.send(f"✅ Added rule {describe_rule(rule)} to {code}")
+
+            elif action == 'list' and args:
+                rules = await self.product_service.get_validation_rules(args[0])
+                if not rules:
+                    await ctx.send(f"❌ No validation rules for {args[0]}")
+                    return
+                await ctx.send(f"**Validation rules for {args[0]}**\n" + "\n".join(describe_rule(r) for r in rules))
+
+            elif action == 'remove' and args:
+                if await self.product_service.remove_validation_rule(int(args[0])):
+                    await ctx.send(f"✅ Removed rule #{args[0]}")
+                else:
+                    await ctx.send(f"❌ Rule #{args[0]} not found")
+
+            else:
+                await ctx.send("❌ Use: rule add <code> <regex/fields/length> ..., rule list <code> or rule remove <id>")
+
+        except ValueError as e:
+            await ctx.send(f"❌ {str(e)}")
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error managing validation rules: {e}")
+
+    @commands.command(name="quarantine")
+    async def quarantine(self, ctx, code: str, action: str = None):
+        """Show or clear stock lines held back by validation rules"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            if action and action.lower() == 'clear':
+                if not await self._confirm_action(ctx, f"Delete all quarantined lines for **{code}**?"):
+                    await ctx.send("❌ Cancelled.")
+                    return
+                cleared = await self.product_service.clear_quarantine(code)
+                await ctx.send(f"✅ Cleared {cleared:,} quarantined lines for {code}")
+                return
+
+            result = await self.product_service.get_quarantine(code)
+            if not result['count']:
+                await ctx.send(f"✅ Nothing quarantined for {code}")
+                return
+
+            embed = discord.Embed(
+                title=f"🚧 Quarantined Stock - {code}",
+                description=f"{result['count']:,} lines held back",
+                color=discord.Color.orange(),
+                timestamp=datetime.utcnow()
+            )
+            for item in result['items']:
+                embed.add_field(
+                    name=item['reason'][:256] if item['reason'] else "Rule removed",
+                    value=f"```{item['content'][:200]}```",
+                    inline=False
+                )
+            await ctx.send(embed=embed)
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error showing quarantine: {e}")
+
+    @commands.command(name="importjobs")
+    async def import_jobs(self, ctx, limit: int = 10):
+        """Show recent stock import jobs"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            jobs = await self.import_manager.list_jobs(limit)
+            if not jobs:
+                await ctx.send("❌ No stock import jobs found.")
+                return
+
+            embed = discord.Embed(
+                title="📥 Stock Import Jobs",
+                color=discord.Color.blue(),
+                timestamp=datetime.utcnow()
+            )
+            for job in jobs:
+                value = (
+                    f"Status: {job['status']}\n"
+                    f"Items: {job['total']:,} ({job['inserted']:,} added, {job['duplicates']:,} duplicates)\n"
+                    f"Started: {job['created_at']}"
+                )
+                if job['error']:
+                    value += f"\nError: {job['error'][:200]}"
+                embed.add_field(
+                    name=f"#{job['id']} {job['product_code']} - {job['filename']}",
+                    value=value,
+                    inline=False
+                )
+            await ctx.send(embed=embed)
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error listing import jobs: {e}")
+
+    @commands.command(name="cancelimport")
+    async def cancel_import(self, ctx, job_id: int):
+        """Cancel a running stock import job"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            if await self.import_manager.cancel_job(job_id):
+                await ctx.send(f"✅ Import #{job_id} cancelled. Items added so far were kept.")
+                self.logger.info(f"Stock import #{job_id} cancelled by {ctx.author}")
+            else:
+                await ctx.send(f"❌ Import #{job_id} is not running.")
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error cancelling import: {e}")
+
+    @commands.command(name="stockcodec")
+    async def stock_codec(self, ctx, action: str = "status"):
+        """Manage compression of stock content at rest"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            action = action.lower()
+            if action in ('on', 'off'):
+                await self.product_service.set_stock_compression(action == 'on')
+                await ctx.send(f"✅ Stock compression turned **{action}** for new stock.")
+            elif action == 'train':
+                result = await self.product_service.train_stock_dictionary()
+                await ctx.send(
+                    f"✅ Trained dictionary #{result['dict_id']} "
+                    f"({result['size']:,} bytes from {result['samples']:,} rows)."
+                )
+            elif action == 'compress':
+                progress_msg = await ctx.send("⏳ Compressing existing stock...")
+                result = await self.product_service.compress_existing_stock()
+                await progress_msg.edit(
+                    content=f"✅ Compressed {result['compressed']:,} of {result['scanned']:,} plain rows."
+                )
+            elif action == 'status':
+                stats = await self.product_service.get_stock_codec_stats()
+                embed = discord.Embed(
+                    title="🗜️ Stock Compression",
+                    color=discord.Color.blue(),
+                    timestamp=datetime.utcnow()
+                )
+                embed.add_field(name="Enabled", value="Yes" if stats['enabled'] else "No", inline=True)
+                embed.add_field(name="Dictionary", value=f"#{stats['dict_id']}" if stats['dict_id'] else "None", inline=True)
+                embed.add_field(name="Rows", value=f"{stats['compressed_rows']:,} compressed / {stats['plain_rows']:,} plain", inline=False)
+                embed.add_field(name="Stock Content", value=f"{stats['stored_bytes'] / 1024 / 1024:.2f} MB", inline=True)
+                embed.add_field(name="Database", value=f"{stats['db_bytes'] / 1024 / 1024:.2f} MB", inline=True)
+                await ctx.send(embed=embed)
+            else:
+                await ctx.send("❌ Use: status, on, off, train or compress")
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error managing stock codec: {e}")
 
     @commands.command(name="addbal")
     async def add_balance(self, ctx, growid: str, amount: int, currency: str):
@@ -395,6 +611,146 @@ class AdminCog(commands.Cog, name="Admin"):
             await ctx.send(f"❌ Error: {str(e)}")
             self.logger.error(f"Error resetting user: {e}")
 
+    def _parse_refund_time(self, value: str, end: bool = False) -> str:
+        """Parse YYYY-MM-DD or YYYY-MM-DDTHH:MM into a UTC timestamp string"""
+        for fmt in ('%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if end and fmt == '%Y-%m-%d':
+                parsed += timedelta(days=1)  # whole end day is included
+            return parsed.strftime('%Y-%m-%d %H:%M:%S')
+        raise ValueError(f"Invalid date `{value}`. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM (UTC)")
+
+    @commands.command(name="bulkrefund")
+    async def bulk_refund(self, ctx, target: str, *args: str):
+        """Refund many purchases at once"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            filters = {}
+            if target.lower() == 'ids':
+                raw_ids = ','.join(args).replace(' ', ',')
+                filters['transaction_ids'] = [int(i) for i in raw_ids.split(',') if i.strip()]
+                if not filters['transaction_ids']:
+                    await ctx.send("❌ Please provide at least one transaction ID!")
+                    return
+            else:
+                if target.lower() != 'all':
+                    filters['product_code'] = target
+                if len(args) > 0:
+                    filters['start'] = self._parse_refund_time(args[0])
+                if len(args) > 1:
+                    filters['end'] = self._parse_refund_time(args[1], end=True)
+
+            purchases = await self.trx_manager.find_refundable_purchases(**filters)
+            if not purchases:
+                await ctx.send("❌ No refundable purchases match those filters.")
+                return
+
+            total_amount = sum(p['total_price'] for p in purchases)
+            users = len({p['growid'] for p in purchases})
+            if not await self._confirm_action(
+                ctx,
+                f"Refund **{len(purchases)}** purchases from **{users}** users, "
+                f"crediting **{total_amount:,} WL** and restoring their stock?"
+            ):
+                await ctx.send("❌ Refund cancelled.")
+                return
+
+            progress_msg = await ctx.send(f"⏳ Refunding... 0/{len(purchases)}")
+
+            async def report_progress(done: int, total: int):
+                await progress_msg.edit(content=f"⏳ Refunding... {done}/{total}")
+
+            result = await self.trx_manager.bulk_refund(
+                str(ctx.author.id),
+                transaction_ids=[p['id'] for p in purchases],
+                progress_callback=report_progress
+            )
+
+            embed = discord.Embed(
+                title="✅ Bulk Refund Complete",
+                color=discord.Color.green(),
+                timestamp=datetime.utcnow()
+            )
+            embed.add_field(name="Refunded", value=f"{result['refunded']}/{result['requested']}", inline=True)
+            embed.add_field(name="Items Restored", value=result['items_restored'], inline=True)
+            embed.add_field(name="Credited", value=f"{result['amount']:,} WL", inline=True)
+            if result['products']:
+                embed.add_field(name="Products", value=", ".join(result['products']), inline=False)
+            if result['missing_users']:
+                embed.add_field(
+                    name="Skipped (user not found)",
+                    value=", ".join(result['missing_users'])[:1024],
+                    inline=False
+                )
+            embed.set_footer(text=f"Refunded by {ctx.author}")
+
+            await progress_msg.delete()
+            await ctx.send(embed=embed)
+            self.logger.info(f"Bulk refund by {ctx.author}: {result}")
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error in bulk refund: {e}")
+
+    @commands.command(name="export")
+    async def export(self, ctx, kind: str, *args: str):
+        """Export stock or transactions as a gzipped CSV"""
+        if not await self._check_admin(ctx):
+            return
+
+        path = None
+        try:
+            kind = kind.lower()
+            if kind == 'stock':
+                product_code = args[0] if args and args[0].lower() != 'all' else None
+                status = args[1].lower() if len(args) > 1 else None
+                if status and status not in (STATUS_AVAILABLE, STATUS_SOLD, STATUS_DELETED):
+                    await ctx.send(f"❌ Status must be {STATUS_AVAILABLE}, {STATUS_SOLD} or {STATUS_DELETED}")
+                    return
+                header = self.product_service.STOCK_EXPORT_COLUMNS
+                rows = self.product_service.iter_stock_export(product_code, status)
+                label = f"stock_{product_code or 'all'}_{status or 'any'}"
+            elif kind in ('transactions', 'sales'):
+                start = self._parse_refund_time(args[0]) if len(args) > 0 else None
+                end = self._parse_refund_time(args[1], end=True) if len(args) > 1 else None
+                header = self.trx_manager.TRANSACTION_EXPORT_COLUMNS
+                rows = self.trx_manager.iter_transaction_export(start, end)
+                label = "transactions"
+            else:
+                await ctx.send("❌ Use: export stock <code|all> [status] or export transactions [from] [to]")
+                return
+
+            progress_msg = await ctx.send("⏳ Exporting...")
+            path, count = await asyncio.to_thread(write_csv_gz, header, rows, f"{label}_")
+
+            size = os.path.getsize(path)
+            limit = ctx.guild.filesize_limit if ctx.guild else EXPORT_DEFAULT_UPLOAD_LIMIT
+            if size > limit:
+                await progress_msg.edit(
+                    content=f"❌ Export is {size / 1024 / 1024:.1f}MB, over the {limit / 1024 / 1024:.0f}MB upload limit. Narrow the filters."
+                )
+                return
+
+            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+            await ctx.send(
+                f"✅ Exported {count:,} rows.",
+                file=discord.File(path, filename=f"{label}_{timestamp}.csv.gz")
+            )
+            await progress_msg.delete()
+            self.logger.info(f"{label} export of {count} rows by {ctx.author}")
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error exporting {kind}: {e}")
+        finally:
+            if path and os.path.exists(path):
+                os.remove(path)
+
     @commands.command(name="systeminfo")
     async def system_info(self, ctx):
         """Show bot system information"""
@@ -430,7 +786,8 @@ class AdminCog(commands.Cog, name="Admin"):
                 f"Uptime: {str(uptime).split('.')[0]}\n"
                 f"Latency: {round(self.bot.latency * 1000)}ms\n"
                 f"Servers: {len(self.bot.guilds)}\n"
-                f"Commands: {len(self.bot.commands)}"
+                f"Commands: {len(self.bot.commands)}\n"
+                f"Active cooldowns: {len(get_cooldown_store(self.bot)):,}"
             )
             embed.add_field(name="🤖 Bot", value=bot_stats, inline=False)
             
@@ -440,6 +797,97 @@ class AdminCog(commands.Cog, name="Admin"):
             await ctx.send(f"❌ Error: {str(e)}")
             self.logger.error(f"Error getting system info: {e}")
 
+    @commands.command(name="outbound")
+    async def outbound_stats(self, ctx):
+        """Show outbound Discord queue depth and latency per priority class"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            stats = self.outbound.get_stats()
+            embed = discord.Embed(
+                title="📤 Outbound Queue",
+                description=f"In flight: {self.outbound.in_flight}",
+                color=discord.Color.blue(),
+                timestamp=datetime.utcnow()
+            )
+            for priority in OUTBOUND_PRIORITIES:
+                entry = stats[priority]
+                embed.add_field(
+                    name=priority.title(),
+                    value=(
+                        f"Queued: {entry['queued']:,}\n"
+                        f"Sent: {entry['sent']:,} (failed {entry['failed']:,})\n"
+                        f"Coalesced: {entry['coalesced']:,}\n"
+                        f"Wait p50/p95: {entry['wait_p50_ms']:.0f}/{entry['wait_p95_ms']:.0f}ms"
+                    ),
+                    inline=True
+                )
+            await ctx.send(embed=embed)
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error getting outbound stats: {e}")
+
+    @commands.command(name="cmdstats")
+    async def command_stats(self, ctx, days: int = 7, command: Optional[str] = None):
+        """Show command usage since start and from user_activity history"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            analytics = self.bot.command_handler.analytics
+            await analytics.flush()
+
+            embed = discord.Embed(
+                title="📊 Command Stats",
+                color=discord.Color.blue(),
+                timestamp=datetime.utcnow()
+            )
+
+            live = sorted(
+                analytics.usage_stats.items(), key=lambda item: item[1]['total_uses'], reverse=True
+            )
+            if command:
+                live = [item for item in live if item[0] == command]
+            lines = [
+                f"`{name}`: {stats['total_uses']:,} uses, ~{stats['users'].count():,} users, "
+                f"{len(analytics.error_stats.get(name, ())):,} recent errors"
+                for name, stats in live[:10]
+            ]
+            embed.add_field(name="Since Start", value="\n".join(lines) or "No commands yet", inline=False)
+
+            history = analytics.get_history(days, command)
+            lines = [
+                f"`{row['command']}`: {row['uses']:,} uses, {row['users']:,} users, {row['errors']:,} errors"
+                for row in history[:10]
+            ]
+            embed.add_field(
+                name=f"Last {days} Days (registered users)",
+                value="\n".join(lines) or "No history",
+                inline=False
+            )
+            await ctx.send(embed=embed)
+
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error getting command stats: {e}")
+
+    @commands.command(name="reloadperms")
+    async def reload_permissions(self, ctx):
+        """Rebuild the permission index from config.json and role_permissions"""
+        if not await self._check_admin(ctx):
+            return
+
+        try:
+            index = self.bot.command_handler.permission_index
+            index.reload()
+            await ctx.send(f"✅ Permissions reloaded: {len(index.roles)} roles")
+            self.logger.info(f"Permissions reloaded by {ctx.author}")
+        except Exception as e:
+            await ctx.send(f"❌ Error: {str(e)}")
+            self.logger.error(f"Error reloading permissions: {e}")
+
     @commands.command(name="announcement")
     async def announcement(self, ctx, *, message: str):
         """Send announcement to all users"""
@@ -475,15 +923,26 @@ class AdminCog(commands.Cog, name="Admin"):
 
             progress_msg = await ctx.send("⏳ Sending announcement...")
 
-            for user_data in users:
+            async def deliver(user_id: int):
+                user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+                await user.send(embed=embed)
+
+            # Queued at broadcast priority so receipts and replies keep going out first
+            deliveries = [
+                self.outbound.submit(
+                    f"dm:{user_data['discord_id']}",
+                    lambda user_id=int(user_data['discord_id']): deliver(user_id),
+                    OUTBOUND_BROADCAST
+                )
+                for user_data in users
+            ]
+            for delivery in asyncio.as_completed(deliveries):
                 try:
-                    user = await self.bot.fetch_user(int(user_data['discord_id']))
-                    if user:
-                        await user.send(embed=embed)
-                        sent_count += 1
-                        if sent_count % 10 == 0:
-                            await progress_msg.edit(content=f"⏳ Sending... ({sent_count}/{len(users)})")
-                except:
+                    await delivery
+                    sent_count += 1
+                    if sent_count % 10 == 0:
+                        await progress_msg.edit(content=f"⏳ Sending... ({sent_count}/{len(users)})")
+                except Exception:
                     failed_count += 1
 
             await progress_msg.delete()
@@ -543,17 +1002,22 @@ class AdminCog(commands.Cog, name="Admin"):
 
             if mode == "on":
                 # Notify all online users
-                for guild in self.bot.guilds:
-                    for member in guild.members:
-                        if not member.bot and member.status != discord.Status.offline:
-                            try:
-                                await member.send(
-                                    "⚠️ The bot is entering maintenance mode. "
-                                    "Some features may be unavailable. "
-                                    "We'll notify you when service is restored."
-                                )
-                            except:
-                                continue
+                notice = (
+                    "⚠️ The bot is entering maintenance mode. "
+                    "Some features may be unavailable. "
+                    "We'll notify you when service is restored."
+                )
+                members = {
+                    member.id: member
+                    for guild in self.bot.guilds for member in guild.members
+                    if not member.bot and member.status != discord.Status.offline
+                }
+                await asyncio.gather(*(
+                    self.outbound.submit(
+                        f"dm:{member.id}", lambda member=member: member.send(notice), OUTBOUND_BROADCAST
+                    )
+                    for member in members.values()
+                ), return_exceptions=True)
             
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
@@ -1,4 +1,5 @@
 import sqlite3
+import hashlib
 import logging
 import time
 from datetime import datetime
@@ -6,11 +7,38 @@ from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+DB_PATH = 'shop.db'
+
+def set_database_path(path: str):
+    """Point every new connection at a different database file"""
+    global DB_PATH
+    DB_PATH = path
+
+STOCK_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_code TEXT NOT NULL,
+        content TEXT NOT NULL,
+        content_hash BLOB NOT NULL,
+        status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'deleted')),
+        added_by TEXT NOT NULL,
+        buyer_id TEXT,
+        seller_id TEXT,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_code) REFERENCES products(code) ON DELETE CASCADE
+    )
+"""
+
+def content_digest(content: str) -> bytes:
+    """Fixed-width 16-byte BLAKE2b digest used to dedupe stock content"""
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
 def get_connection(max_retries: int = 3, timeout: int = 5) -> sqlite3.Connection:
     """Get SQLite database connection with retry mechanism"""
     for attempt in range(max_retries):
         try:
-            conn = sqlite3.connect('shop.db', timeout=timeout)
+            conn = sqlite3.connect(DB_PATH, timeout=timeout)
             conn.row_factory = sqlite3.Row
             
             # Enable foreign keys and set pragmas
@@ -68,22 +96,113 @@ def setup_database():
             )
         """)
 
-        # Create stock table
+        # Create stock table (content is deduplicated through content_hash)
+        cursor.execute(STOCK_TABLE_SQL.format(table="stock"))
+        migrate_stock_content_hash(conn)
+
+        # Create stock_archive table (sold and deleted rows moved out of stock)
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stock (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+            CREATE TABLE IF NOT EXISTS stock_archive (
+                id INTEGER PRIMARY KEY,
                 product_code TEXT NOT NULL,
-                content TEXT NOT NULL UNIQUE,
-                status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'deleted')),
+                content TEXT NOT NULL,
+                content_hash BLOB NOT NULL,
+                status TEXT,
                 added_by TEXT NOT NULL,
                 buyer_id TEXT,
                 seller_id TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                added_at TIMESTAMP,
+                updated_at TIMESTAMP,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Create stock_codec_dicts table (zlib preset dictionaries for stock content)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_codec_dicts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dictionary BLOB NOT NULL,
+                sample_size INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Create stock_bloom_blocks table (persisted Bloom filter over stock content hashes)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_bloom_blocks (
+                block INTEGER PRIMARY KEY,
+                bits BLOB NOT NULL
+            )
+        """)
+
+        # Create product_validation_rules table (checks applied to imported stock lines)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS product_validation_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_code TEXT NOT NULL,
+                rule_type TEXT NOT NULL CHECK (rule_type IN ('regex', 'fields', 'length')),
+                pattern TEXT,
+                separator TEXT,
+                min_value INTEGER,
+                max_value INTEGER,
+                action TEXT DEFAULT 'quarantine' CHECK (action IN ('reject', 'quarantine')),
+                created_by TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (product_code) REFERENCES products(code) ON DELETE CASCADE
+            )
+        """)
+
+        # Create stock_quarantine table (imported lines held back by a validation rule)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_quarantine (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_code TEXT NOT NULL,
+                content TEXT NOT NULL,
+                rule_id INTEGER,
+                reason TEXT,
+                added_by TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (product_code) REFERENCES products(code) ON DELETE CASCADE
+            )
+        """)
+
+        # Create stock_import_jobs table (background, resumable !addstock imports)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_import_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_code TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                added_by TEXT NOT NULL,
+                channel_id TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                status_message_id TEXT,
+                status TEXT DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed', 'cancelled')),
+                byte_offset INTEGER DEFAULT 0,
+                line_offset INTEGER DEFAULT 0,
+                total INTEGER DEFAULT 0,
+                inserted INTEGER DEFAULT 0,
+                duplicates INTEGER DEFAULT 0,
+                rejected INTEGER DEFAULT 0,
+                quarantined INTEGER DEFAULT 0,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (product_code) REFERENCES products(code) ON DELETE CASCADE
             )
         """)
 
+        # Create stock_all view so history queries see archived rows too
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS stock_all AS
+            SELECT id, product_code, content, content_hash, status, added_by,
+                   buyer_id, seller_id, added_at, updated_at
+            FROM stock
+            UNION ALL
+            SELECT id, product_code, content, content_hash, status, added_by,
+                   buyer_id, seller_id, added_at, updated_at
+            FROM stock_archive
+        """)
+
         # Create transactions table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS transactions (
@@ -95,11 +214,41 @@ def setup_database():
                 new_balance TEXT,
                 items_count INTEGER DEFAULT 0,
                 total_price INTEGER DEFAULT 0,
+                related_transaction_id INTEGER,
+                related_growid TEXT,
+                admin_id TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
             )
         """)
 
+        # Add columns introduced after the original schema
+        column_migrations = [
+            ("transactions", "related_transaction_id", "INTEGER"),
+            ("transactions", "related_growid", "TEXT"),
+            ("transactions", "admin_id", "TEXT"),
+            ("stock_import_jobs", "rejected", "INTEGER DEFAULT 0"),
+            ("stock_import_jobs", "quarantined", "INTEGER DEFAULT 0"),
+            ("stock_import_jobs", "line_offset", "INTEGER DEFAULT 0")
+        ]
+
+        for table, column, definition in column_migrations:
+            cursor.execute(f"PRAGMA table_info({table})")
+            if column not in {row['name'] for row in cursor.fetchall()}:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                logger.info(f"Added column {table}.{column}")
+
+        # Create purchase_items table (stock rows sold by each purchase)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS purchase_items (
+                transaction_id INTEGER NOT NULL,
+                stock_id INTEGER NOT NULL,
+                product_code TEXT NOT NULL,
+                PRIMARY KEY (transaction_id, stock_id),
+                FOREIGN KEY (transaction_id) REFERENCES transactions(id) ON DELETE CASCADE
+            )
+        """)
+
         # Create world_info table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS world_info (
@@ -193,9 +342,12 @@ def setup_database():
                 WHERE code = NEW.code;
             END;
             """),
+            # Only status and ownership changes count; re-encoding content must not
+            # restart the archive clock, and an explicit updated_at is kept
             ("""
             CREATE TRIGGER IF NOT EXISTS update_stock_timestamp 
-            AFTER UPDATE ON stock
+            AFTER UPDATE OF status, buyer_id, seller_id, product_code ON stock
+            WHEN NEW.updated_at IS OLD.updated_at
             BEGIN
                 UPDATE stock SET updated_at = CURRENT_TIMESTAMP
                 WHERE id = NEW.id;
@@ -220,6 +372,12 @@ def setup_database():
             """)
         ]
 
+        # Earlier versions fired the stock trigger on every update
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'update_stock_timestamp'")
+        row = cursor.fetchone()
+        if row and 'UPDATE OF' not in row['sql']:
+            cursor.execute("DROP TRIGGER update_stock_timestamp")
+
         for trigger in triggers:
             cursor.execute(trigger)
 
@@ -229,15 +387,26 @@ def setup_database():
             ("idx_user_growid_growid", "user_growid(growid)"),
             ("idx_stock_product_code", "stock(product_code)"),
             ("idx_stock_status", "stock(status)"),
-            ("idx_stock_content", "stock(content)"),
+            ("idx_stock_status_updated", "stock(status, updated_at)"),
+            ("idx_stock_product_status", "stock(product_code, status)"),
+            ("idx_stock_archive_product", "stock_archive(product_code)"),
+            ("idx_stock_archive_buyer", "stock_archive(buyer_id)"),
             ("idx_transactions_growid", "transactions(growid)"),
             ("idx_transactions_created", "transactions(created_at)"),
+            ("idx_transactions_growid_type", "transactions(growid, type, id)"),
+            ("idx_transactions_related", "transactions(related_transaction_id)"),
+            ("idx_purchase_items_stock", "purchase_items(stock_id)"),
+            ("idx_purchase_items_product", "purchase_items(product_code, transaction_id)"),
+            ("idx_stock_import_jobs_status", "stock_import_jobs(status)"),
+            ("idx_validation_rules_product", "product_validation_rules(product_code)"),
+            ("idx_stock_quarantine_product", "stock_quarantine(product_code)"),
             ("idx_blacklist_growid", "blacklist(growid)"),
             # New indexes
             ("idx_admin_logs_admin", "admin_logs(admin_id)"),
             ("idx_admin_logs_created", "admin_logs(created_at)"),
             ("idx_user_activity_discord", "user_activity(discord_id)"),
             ("idx_user_activity_type", "user_activity(activity_type)"),
+            ("idx_user_activity_type_created", "user_activity(activity_type, created_at)"),
             ("idx_role_permissions_role", "role_permissions(role_id)"),
             ("idx_cache_expires", "cache_table(expires_at)")
         ]
@@ -245,6 +414,10 @@ def setup_database():
         for idx_name, idx_cols in indexes:
             cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {idx_cols}")
 
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_content_hash ON stock(content_hash)")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_archive_content_hash ON stock_archive(content_hash)")
+        cursor.execute("DROP INDEX IF EXISTS idx_stock_content")
+
         # Insert default world info if not exists
         cursor.execute("""
             INSERT OR IGNORE INTO world_info (id, world, owner, bot)
@@ -269,6 +442,45 @@ def setup_database():
         if conn:
             conn.close()
 
+def migrate_stock_content_hash(conn: sqlite3.Connection):
+    """Rebuild a legacy stock table (UNIQUE on content) with a content_hash column.
+
+    SQLite can't drop the implicit UNIQUE index in place, so the table is
+    copied into the new layout and renamed. Triggers and indexes are
+    recreated by setup_database afterwards.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(stock)")
+    columns = [row['name'] for row in cursor.fetchall()]
+    if 'content_hash' in columns:
+        return
+
+    logger.info("Migrating stock table to hashed content dedupe...")
+    conn.commit()
+    conn.create_function("content_digest", 1, content_digest, deterministic=True)
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("DROP TABLE IF EXISTS stock_migration")
+        cursor.execute(STOCK_TABLE_SQL.format(table="stock_migration"))
+        cursor.execute("""
+            INSERT INTO stock_migration
+            (id, product_code, content, content_hash, status, added_by, buyer_id, seller_id, added_at, updated_at)
+            SELECT id, product_code, content, content_digest(content), status, added_by,
+                   buyer_id, seller_id, added_at, updated_at
+            FROM stock
+        """)
+        migrated = cursor.rowcount
+        cursor.execute("DROP TABLE stock")
+        cursor.execute("ALTER TABLE stock_migration RENAME TO stock")
+        conn.commit()
+        logger.info(f"Migrated {migrated} stock rows to hashed content dedupe")
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("PRAGMA foreign_keys = ON")
+
 def verify_database():
     """Verify database integrity and tables existence"""
     conn = None
@@ -278,8 +490,9 @@ def verify_database():
 
         # Check all tables exist
         tables = [
-            'users', 'user_growid', 'products', 'stock', 
-            'transactions', 'world_info', 'bot_settings', 'blacklist',
+            'users', 'user_growid', 'products', 'stock', 'stock_archive', 'stock_codec_dicts',
+            'stock_bloom_blocks', 'stock_import_jobs', 'product_validation_rules', 'stock_quarantine',
+            'transactions', 'purchase_items', 'world_info', 'bot_settings', 'blacklist',
             'admin_logs', 'role_permissions', 'user_activity', 'cache_table'
         ]
 
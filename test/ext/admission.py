@@ -0,0 +1,155 @@
+import logging
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+from .constants import (
+    PURCHASE_MAX_CONCURRENT,
+    PURCHASE_QUEUE_TIMEOUT,
+    PURCHASE_MAX_QUEUE,
+    SoldOutError,
+    QueueFullError,
+    QueueTimeoutError
+)
+
+class ProductGate:
+    """Concurrency slots and FIFO wait queue for a single product"""
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self.active = 0
+        self.waiters = deque()
+        self.sold_out = False
+
+    @property
+    def queued(self) -> int:
+        return len(self.waiters)
+
+class PurchaseAdmissionController:
+    """Per-product admission control for purchases.
+
+    At most ``max_concurrent`` purchases of a product run at once; the rest
+    wait first-come-first-served until a slot frees up or the timeout hits.
+    Once a product is known to be sold out new requests fail fast and every
+    queued buyer is released with SoldOutError until the product is restocked.
+    """
+    _instance = None
+
+    def __new__(cls, bot):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self, bot):
+        if not self.initialized:
+            self.bot = bot
+            self.logger = logging.getLogger("PurchaseAdmissionController")
+            self.max_concurrent = PURCHASE_MAX_CONCURRENT
+            self.queue_timeout = PURCHASE_QUEUE_TIMEOUT
+            self.max_queue = PURCHASE_MAX_QUEUE
+            self._gates: Dict[str, ProductGate] = {}
+            self.initialized = True
+
+    def _get_gate(self, product_code: str) -> ProductGate:
+        if product_code not in self._gates:
+            self._gates[product_code] = ProductGate(self.max_concurrent)
+        return self._gates[product_code]
+
+    @asynccontextmanager
+    async def admit(self, product_code: str,
+                    on_queued: Optional[Callable[[int], Awaitable[None]]] = None):
+        """Hold a purchase slot for ``product_code`` for the duration of the block.
+
+        ``on_queued`` is awaited with the buyer's 1-based queue position when
+        no slot is free right away.
+        """
+        gate = self._get_gate(product_code)
+        if gate.sold_out:
+            raise SoldOutError(f"{product_code} is sold out")
+
+        if gate.active < gate.max_concurrent and not gate.waiters:
+            gate.active += 1
+        else:
+            await self._wait_for_slot(gate, product_code, on_queued)
+
+        try:
+            yield
+        finally:
+            self._release(gate)
+
+    async def _wait_for_slot(self, gate: ProductGate, product_code: str,
+                             on_queued: Optional[Callable[[int], Awaitable[None]]]):
+        if gate.queued >= self.max_queue:
+            raise QueueFullError(f"Too many buyers are waiting for {product_code}, please try again shortly")
+
+        waiter = asyncio.get_running_loop().create_future()
+        gate.waiters.append(waiter)
+        position = gate.queued
+
+        try:
+            if on_queued:
+                try:
+                    await on_queued(position)
+                except Exception as e:
+                    self.logger.warning(f"Queue position callback failed for {product_code}: {e}")
+
+            admitted = await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                # Slot was handed over just as we gave up; pass it on
+                self._release(gate)
+            else:
+                waiter.cancel()
+                try:
+                    gate.waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                raise QueueTimeoutError(f"Timed out waiting in the queue for {product_code}") from None
+            raise
+
+        if not admitted:
+            raise SoldOutError(f"{product_code} is sold out")
+
+    def _release(self, gate: ProductGate):
+        # Hand the slot directly to the next live waiter so active never dips
+        while gate.waiters:
+            waiter = gate.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        gate.active -= 1
+
+    def mark_sold_out(self, product_code: str):
+        """Stop admitting purchases for a product and release its queue"""
+        gate = self._get_gate(product_code)
+        if gate.sold_out:
+            return
+        gate.sold_out = True
+        released = 0
+        while gate.waiters:
+            waiter = gate.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(False)
+                released += 1
+        self.logger.info(f"{product_code} marked sold out, released {released} queued buyers")
+
+    def mark_available(self, product_code: str):
+        """Re-open admission after a product is restocked"""
+        gate = self._gates.get(product_code)
+        if gate and gate.sold_out:
+            gate.sold_out = False
+            self.logger.info(f"{product_code} re-opened for purchases")
+
+    def is_sold_out(self, product_code: str) -> bool:
+        gate = self._gates.get(product_code)
+        return bool(gate and gate.sold_out)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Active and queued purchases per product"""
+        return {
+            code: {'active': gate.active, 'queued': gate.queued, 'sold_out': gate.sold_out}
+            for code, gate in self._gates.items()
+        }
@@ -336,6 +336,13 @@ class BalanceManagerService:
                 if conn:
                     conn.close()
 
+    def invalidate_cache(self, growid: str = None):
+        """Invalidate cached balance for a specific user or everything"""
+        if growid:
+            self._cache.pop(f"balance_{growid}", None)
+        else:
+            self._cache.clear()
+
     async def cleanup(self):
         """Cleanup resources"""
         self._cache.clear()
@@ -0,0 +1,78 @@
+import math
+from typing import Iterable, Iterator, Optional, Set, Tuple
+
+class BloomFilter:
+    """Bloom filter over fixed-width, uniformly distributed digests.
+
+    Bit positions come from double hashing the two 64-bit halves of the
+    digest, so no extra hashing is done per lookup. The bit array is split
+    into ``block_size`` byte blocks and blocks touched since the last save
+    are tracked in ``dirty``, letting callers persist only what changed.
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int, block_size: int,
+                 bits: Optional[bytearray] = None, count: int = 0):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.block_size = block_size
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+        self.count = count
+        self.dirty: Set[int] = set()
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float, block_size: int) -> 'BloomFilter':
+        """Size a filter for ``capacity`` items at the target false positive rate"""
+        num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes, block_size)
+
+    @property
+    def num_blocks(self) -> int:
+        return (len(self.bits) + self.block_size - 1) // self.block_size
+
+    def _positions(self, digest: bytes) -> Iterator[int]:
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, digest: bytes) -> bool:
+        """Set the digest's bits; returns True if it was not already present"""
+        bits = self.bits
+        added = False
+        for position in self._positions(digest):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                self.dirty.add(byte // self.block_size)
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def update(self, digests: Iterable[bytes]) -> int:
+        return sum(1 for digest in digests if self.add(digest))
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits = self.bits
+        for position in self._positions(digest):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def estimated_error_rate(self) -> float:
+        """False positive rate at the current fill level"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def load_block(self, index: int, data: bytes):
+        start = index * self.block_size
+        self.bits[start:start + len(data)] = data
+
+    def dirty_blocks(self) -> Iterator[Tuple[int, bytes]]:
+        """Yield (index, bytes) for every block changed since the last clear"""
+        for index in sorted(self.dirty):
+            start = index * self.block_size
+            yield index, bytes(self.bits[start:start + self.block_size])
+
+    def mark_all_dirty(self):
+        self.dirty = set(range(self.num_blocks))
@@ -3,7 +3,13 @@ from collections import namedtuple
 
 # Timeouts and Intervals
 COOLDOWN_SECONDS = 3
-UPDATE_INTERVAL = 55  # seconds
+LIVE_STOCK_FALLBACK_INTERVAL = 300  # seconds, slow timer in case a change event is missed
+LIVE_STOCK_DEBOUNCE = 2  # seconds to gather a burst of stock changes into one edit
+LIVE_STOCK_MIN_EDIT_INTERVAL = 5  # seconds between board edits
+LIVE_STOCK_HEARTBEAT = 900  # seconds between edits when nothing changed
+LIVE_STOCK_FIELDS_PER_PAGE = 20  # Discord allows 25 fields per embed
+LIVE_STOCK_PAGE_CHARS = 5000  # field text per page; Discord caps an embed at 6000
+LIVE_STOCK_MAX_BACKOFF = 600  # seconds, cap on retry delay for a board channel that keeps failing
 CACHE_TIMEOUT = 60
 PAGE_TIMEOUT = 60  # seconds
 ADMIN_CONFIRM_TIMEOUT = 30  # seconds
@@ -32,16 +38,56 @@ CURRENCY_RATES = {
 }
 
 # File Limits and Settings
-MAX_STOCK_FILE_SIZE = 1024 * 1024  # 1MB
-VALID_STOCK_FORMATS = ['txt']
+MAX_STOCK_FILE_SIZE = 500 * 1024 * 1024  # 500MB, stock files are streamed
+MAX_STOCK_UNCOMPRESSED_SIZE = 2 * 1024 * 1024 * 1024  # 2GB, limit for .txt.gz/.zip once decompressed
+MAX_STOCK_ZIP_MEMBERS = 100
+VALID_STOCK_FORMATS = ['txt', 'txt.gz', 'zip']
 MAX_FILE_SIZES = {
-    'stock': 1024 * 1024,  # 1MB
+    'stock': 500 * 1024 * 1024,  # 500MB
     'backup': 10 * 1024 * 1024  # 10MB
 }
 ALLOWED_FILE_TYPES = {
-    'stock': ['txt'],
+    'stock': ['txt', 'txt.gz', 'zip'],
     'backup': ['db', 'sqlite', 'backup']
 }
+STOCK_IMPORT_CHUNK_SIZE = 5000  # rows per executemany/commit
+STOCK_STREAM_CHUNK_SIZE = 64 * 1024  # bytes read from the upload at a time
+STOCK_MAX_LINE_LENGTH = 4096  # bytes; a longer line fails the import
+STOCK_IMPORT_PROGRESS_INTERVAL = 5  # seconds between import status message edits
+
+# Stock Import Job Status
+IMPORT_QUEUED = 'queued'
+IMPORT_RUNNING = 'running'
+IMPORT_COMPLETED = 'completed'
+IMPORT_FAILED = 'failed'
+IMPORT_CANCELLED = 'cancelled'
+
+# Stock Validation Rules
+RULE_REGEX = 'regex'
+RULE_FIELDS = 'fields'
+RULE_LENGTH = 'length'
+RULE_ACTION_REJECT = 'reject'
+RULE_ACTION_QUARANTINE = 'quarantine'
+
+# Stock Content Compression
+STOCK_COMPRESSION_LEVEL = 9
+STOCK_CODEC_DICT_SIZE = 16 * 1024  # bytes, zlib uses at most 32KB
+STOCK_CODEC_SAMPLE_SIZE = 2000  # rows sampled when training a dictionary
+
+# Stock Duplicate Filter
+STOCK_BLOOM_CAPACITY = 1_000_000  # minimum items the filter is sized for
+STOCK_BLOOM_ERROR_RATE = 0.01
+STOCK_BLOOM_BLOCK_SIZE = 64 * 1024  # bytes per persisted block
+STOCK_BLOOM_STALE_RATIO = 0.25  # rebuild once this share of entries was deleted
+
+# Stock Archival
+STOCK_ARCHIVE_SOLD_AGE_DAYS = 30  # sold rows older than this leave the hot table
+STOCK_ARCHIVE_CHUNK_SIZE = 2000
+STOCK_ARCHIVE_INTERVAL_HOURS = 6
+
+# Exports
+EXPORT_FETCH_SIZE = 1000  # rows per fetchmany while streaming an export
+EXPORT_DEFAULT_UPLOAD_LIMIT = 8 * 1024 * 1024  # bytes, used outside guilds
 
 # Pagination Settings
 DEFAULT_PAGE_SIZE = 5
@@ -63,6 +109,47 @@ MAX_PURCHASE_QUANTITY = 100
 MAX_TRANSACTION_HISTORY = 50
 ADMIN_BULK_UPDATE_CHUNK = 10
 
+# Purchase Admission (per product)
+PURCHASE_MAX_CONCURRENT = 2
+PURCHASE_QUEUE_TIMEOUT = 30  # seconds
+PURCHASE_MAX_QUEUE = 500
+
+# Refunds
+REFUND_CHUNK_SIZE = 200  # purchases per database transaction
+
+# Outbound Discord calls, highest priority first
+OUTBOUND_INTERACTIVE = 'interactive'  # purchase receipt DMs
+OUTBOUND_BOARD = 'board'  # live stock board and import status edits
+OUTBOUND_LOG = 'log'  # command, purchase and donation log embeds
+OUTBOUND_BROADCAST = 'broadcast'  # announcement and maintenance DMs
+OUTBOUND_PRIORITIES = [OUTBOUND_INTERACTIVE, OUTBOUND_BOARD, OUTBOUND_LOG, OUTBOUND_BROADCAST]
+OUTBOUND_RESERVE = {  # share of the global budget a class leaves for the classes above it
+    OUTBOUND_INTERACTIVE: 0.0,
+    OUTBOUND_BOARD: 0.2,
+    OUTBOUND_LOG: 0.4,
+    OUTBOUND_BROADCAST: 0.6
+}
+OUTBOUND_GLOBAL_RATE = (40, 1.0)  # requests per second over all routes; Discord allows 50
+OUTBOUND_ROUTE_RATE = (5, 5.0)  # requests per channel or DM, matching message send limits
+OUTBOUND_MAX_IN_FLIGHT = 10  # interactive calls are exempt
+OUTBOUND_LATENCY_SAMPLES = 500  # recent queue wait samples kept per class
+OUTBOUND_MAX_IDLE_ROUTES = 1000  # full, idle route budgets are dropped past this many
+
+# Command analytics
+ACTIVITY_COMMAND = 'command'  # user_activity.activity_type for batched command usage
+ANALYTICS_FLUSH_INTERVAL = 60  # seconds between user_activity flushes
+ANALYTICS_MAX_PENDING = 5000  # user/command pairs buffered before flushing early
+ANALYTICS_ERROR_BUFFER = 50  # recent errors kept per command
+ANALYTICS_HLL_PRECISION = 12  # 4KB per distinct-count estimate, about 1.6% error
+
+# Command audit log
+COMMAND_LOG_FLUSH_INTERVAL = 30  # seconds between digests in the logs channel
+COMMAND_LOG_MAX_BATCH = 25  # events that trigger an early digest
+COMMAND_LOG_FILE = 'logs/commands.jsonl'  # full detail, one JSON event per line
+COMMAND_LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+COMMAND_LOG_FILE_BACKUPS = 5
+PERMISSION_RELOAD_INTERVAL = 60  # seconds between checks for changed role permissions
+
 # Colors
 COLORS = {
     'success': discord.Color.green(),
@@ -88,11 +175,12 @@ MESSAGES = {
     'SUCCESS_REMOVE': "✅ Successfully removed!",
     'SUCCESS_UPDATE': "✅ Successfully updated!",
     'INVALID_CURRENCY': "❌ Invalid currency. Use: WL, DL, or BGL",
-    'FILE_TOO_LARGE': "❌ File is too large! Maximum size is 1MB.",
-    'INVALID_FILE_FORMAT': "❌ Invalid file format! Please use .txt files only.",
+    'FILE_TOO_LARGE': "❌ File is too large! Maximum size is 500MB.",
+    'INVALID_FILE_FORMAT': "❌ Invalid file format! Please use .txt, .txt.gz or .zip files.",
     'NO_ITEMS_FOUND': "❌ No items found in file!",
     'STOCK_ADDED': "✅ Stock items successfully added!",
-    'PROCESSING': "⏳ Processing... Please wait..."
+    'PROCESSING': "⏳ Processing... Please wait...",
+    'QUEUE_POSITION': "⏳ High demand right now! You're #{position} in line for `{code}`, please wait..."
 }
 
 # Database Settings
@@ -128,6 +216,22 @@ class ValidationError(Exception):
     """Custom exception for validation-related errors"""
     pass
 
+class AdmissionError(TransactionError):
+    """Purchase was not admitted by the per-product admission controller"""
+    pass
+
+class SoldOutError(AdmissionError):
+    """Product is known to be sold out"""
+    pass
+
+class QueueFullError(AdmissionError):
+    """Too many buyers already queued for the product"""
+    pass
+
+class QueueTimeoutError(AdmissionError):
+    """Buyer waited in the queue longer than the timeout"""
+    pass
+
 # Balance Class
 class Balance:
     def __init__(self, wl: int = 0, dl: int = 0, bgl: int = 0):
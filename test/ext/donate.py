@@ -6,7 +6,8 @@ import json
 import asyncio
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from database import get_connection
-from .constants import Balance, TransactionError, CURRENCY_RATES, MESSAGES
+from .constants import Balance, TransactionError, CURRENCY_RATES, MESSAGES, OUTBOUND_LOG
+from .outbound import OutboundDispatcher
 
 # Load config
 with open('config.json') as config_file:
@@ -173,7 +174,9 @@ class DonationManager:
                 inline=False
             )
             
-            await channel.send(embed=embed)
+            OutboundDispatcher(self.bot).send_later(
+                f"channel:{channel.id}", lambda: channel.send(embed=embed), OUTBOUND_LOG
+            )
             
         except Exception as e:
             self.logger.error(f"Error logging to Discord: {e}")
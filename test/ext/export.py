@@ -0,0 +1,26 @@
+import csv
+import gzip
+import os
+import tempfile
+from typing import Iterable, Sequence, Tuple
+
+def write_csv_gz(header: Sequence[str], rows: Iterable[Sequence], prefix: str = "export_") -> Tuple[str, int]:
+    """Stream rows into a gzip-compressed CSV temp file.
+
+    Rows are written as they come off the iterator, so memory stays flat for
+    any export size. Returns the file path and row count; the caller owns the
+    file and must remove it. Blocking, so run it with ``asyncio.to_thread``.
+    """
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".csv.gz")
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, count
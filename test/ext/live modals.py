@@ -6,6 +6,7 @@ from datetime import datetime
 from .balance_manager import BalanceManagerService
 from .product_manager import ProductManagerService
 from .trx import TransactionManager
+from .constants import MESSAGES
 
 class BuyModal(ui.Modal, title="Buy Product"):
     def __init__(self, bot):
@@ -57,12 +58,19 @@ class BuyModal(ui.Modal, title="Buy Product"):
                 await interaction.followup.send("❌ Invalid quantity!", ephemeral=True)
                 return
     
-            # Process purchase
+            # Process purchase, telling the buyer where they are if the product is busy
+            async def notify_queued(position: int):
+                await interaction.followup.send(
+                    MESSAGES['QUEUE_POSITION'].format(position=position, code=self.code.value),
+                    ephemeral=True
+                )
+
             try:
                 result = await self.trx_manager.process_purchase(
                     growid=growid,
                     product_code=self.code.value,
-                    quantity=quantity
+                    quantity=quantity,
+                    on_queued=notify_queued
                 )
             except Exception as e:
                 await interaction.followup.send(f"❌ {str(e)}", ephemeral=True)
@@ -98,15 +106,14 @@ class BuyModal(ui.Modal, title="Buy Product"):
                     inline=False
                 )
     
-            content_msg = "**Your Items:**\n"
-            for item in result['items']:
-                content_msg += f"```{item['content']}```\n"
+            content_msg = None
+            if not dm_sent:
+                content_msg = "**Your Items:**\n"
+                for item_content in self.trx_manager.decode_items(result['items']):
+                    content_msg += f"```{item_content}```\n"
     
-            await interaction.followup.send(
-                embed=embed,
-                content=content_msg if not dm_sent else None,
-                ephemeral=True
-            )
+            # Interaction webhooks are outside the bot's global rate limit, so reply directly
+            await interaction.followup.send(embed=embed, content=content_msg, ephemeral=True)
     
         except Exception as e:
             self.logger.error(f"Error in BuyModal: {e}")
@@ -1,11 +1,108 @@
 import discord
 import logging
 import time
+import hashlib
+import json
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 from .product_manager import ProductManagerService
-from .constants import CACHE_TIMEOUT
+from database import get_connection
+from .constants import (
+    CACHE_TIMEOUT,
+    LIVE_STOCK_FIELDS_PER_PAGE,
+    LIVE_STOCK_PAGE_CHARS,
+    LIVE_STOCK_MIN_EDIT_INTERVAL,
+    LIVE_STOCK_MAX_BACKOFF
+)
+
+class StockBoardLayout:
+    """Stable product-to-page assignment for the multi-message live board.
+
+    Products keep the page they were first placed on, so adding or removing
+    one only touches the pages it lands on or leaves. New products fill the
+    first page with room; a page that no longer fits its products spills
+    the overflow the same way. Pages emptied by deleted products are dropped.
+    """
+
+    def __init__(self, max_fields: int = LIVE_STOCK_FIELDS_PER_PAGE, max_chars: int = LIVE_STOCK_PAGE_CHARS):
+        self.max_fields = max_fields
+        self.max_chars = max_chars
+        self.assignments: Dict[str, int] = {}
+
+    def assign(self, products: List[Dict], field_size: Callable[[Dict], int]) -> List[List[Dict]]:
+        pages: List[List[Dict]] = []
+        sizes: List[int] = []
+        unplaced = []
+
+        def fits(index: int, size: int) -> bool:
+            return len(pages[index]) < self.max_fields and sizes[index] + size <= self.max_chars
+
+        for product in sorted(products, key=lambda x: x['code']):
+            index = self.assignments.get(product['code'])
+            size = field_size(product)
+            if index is None:
+                unplaced.append((product, size))
+                continue
+            while len(pages) <= index:
+                pages.append([])
+                sizes.append(0)
+            if fits(index, size):
+                pages[index].append(product)
+                sizes[index] += size
+            else:
+                unplaced.append((product, size))
+
+        for product, size in unplaced:
+            index = next((i for i in range(len(pages)) if fits(i, size)), None)
+            if index is None:
+                pages.append([])
+                sizes.append(0)
+                index = len(pages) - 1
+            pages[index].append(product)
+            sizes[index] += size
+
+        pages = [sorted(page, key=lambda x: x['code']) for page in pages if page]
+        self.assignments = {product['code']: index for index, page in enumerate(pages) for product in page}
+        return pages
+
+class BoardTarget:
+    """One channel showing the live board, with its own messages and backoff.
+
+    ``page_fingerprints`` holds what each of this channel's messages last
+    showed, so a target that missed an edit catches up on the next refresh
+    while the others are left alone.
+    """
+
+    def __init__(self, channel_id: int):
+        self.channel_id = channel_id
+        self.message_ids: List[int] = []
+        self.page_fingerprints: List[Optional[str]] = []
+        self.saved_state: Optional[Dict] = None
+        self.last_edit = 0.0
+        self.retry_at = 0.0
+        self.failures = 0
+
+    @property
+    def state_key(self) -> str:
+        return f"live_stock_board:{self.channel_id}"
+
+    def changed_pages(self, fingerprints: List[str], heartbeat: bool) -> List[int]:
+        """Indexes of the pages this target has to edit or post"""
+        return [
+            index for index, fingerprint in enumerate(fingerprints)
+            if heartbeat or index >= len(self.message_ids) or index >= len(self.page_fingerprints)
+            or fingerprint != self.page_fingerprints[index]
+        ]
+
+    def back_off(self, now: float, retry_after: Optional[float] = None) -> float:
+        """Push the next attempt back after a failed update; returns the delay"""
+        self.failures += 1
+        delay = min(LIVE_STOCK_MAX_BACKOFF, LIVE_STOCK_MIN_EDIT_INTERVAL * 2 ** (self.failures - 1))
+        if retry_after:
+            delay = max(delay, retry_after)
+        self.retry_at = now + delay
+        return delay
 
 class LiveStockService:
     _instance = None
@@ -39,42 +136,84 @@ class LiveStockService:
             'timestamp': time.time()
         }
 
-    async def create_stock_embed(self, products: list) -> discord.Embed:
-        cache_key = f"stock_embed_{hash(str(products))}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+    FINGERPRINT_FIELDS = ('code', 'name', 'price', 'description', 'stock_count')
+
+    def stock_fingerprint(self, products: list) -> str:
+        """Digest of everything the board shows, so unchanged stock skips the edit"""
+        rows = sorted(tuple(product.get(field) for field in self.FINGERPRINT_FIELDS) for product in products)
+        return hashlib.blake2b(repr(rows).encode('utf-8'), digest_size=16).hexdigest()
 
+    def product_field(self, product: Dict) -> Tuple[str, str]:
+        """Embed field name and value for one product"""
+        value = (
+            f"💎 Code: `{product['code']}`\n"
+            f"📦 Stock: `{product['stock_count']}`\n"
+            f"💰 Price: `{product['price']:,} WL`\n"
+        )
+        if product.get('description'):
+            info = product['description']
+            room = 1024 - len(value) - len("📝 Info: \n")
+            if len(info) > room:
+                info = info[:room - 1] + "…"
+            value += f"📝 Info: {info}\n"
+        return f"🔸 {product['name']} 🔸"[:256], value
+
+    def field_size(self, product: Dict) -> int:
+        name, value = self.product_field(product)
+        return len(name) + len(value)
+
+    async def create_stock_embed(self, products: list, page: int = 1, pages: int = 1) -> discord.Embed:
+        """Render the board from a stock snapshot; counts come from the rows, not extra queries"""
+        title = "🏪 Store Stock Status"
+        if pages > 1:
+            title += f" ({page}/{pages})"
         embed = discord.Embed(
-            title="🏪 Store Stock Status",
+            title=title,
             color=discord.Color.blue(),
             timestamp=datetime.utcnow()
         )
 
         if products:
             for product in sorted(products, key=lambda x: x['code']):
-                stock_count = await self.product_manager.get_stock_count(product['code'])
-                value = (
-                    f"💎 Code: `{product['code']}`\n"
-                    f"📦 Stock: `{stock_count}`\n"
-                    f"💰 Price: `{product['price']:,} WL`\n"
-                )
-                if product.get('description'):
-                    value += f"📝 Info: {product['description']}\n"
-                
-                embed.add_field(
-                    name=f"🔸 {product['name']} 🔸",
-                    value=value,
-                    inline=False
-                )
+                name, value = self.product_field(product)
+                embed.add_field(name=name, value=value, inline=False)
         else:
             embed.description = "No products available."
 
         embed.set_footer(text=f"Last Update: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC")
-        
-        self._set_cached(cache_key, embed)
         return embed
 
+    async def load_board_state(self, key: str = 'live_stock_board') -> Dict:
+        """Board message IDs and page layout saved in bot_settings"""
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM bot_settings WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            return json.loads(row['value']) if row else {}
+        except Exception as e:
+            self.logger.error(f"Error loading {key}: {e}")
+            return {}
+        finally:
+            if conn:
+                conn.close()
+
+    async def save_board_state(self, state: Dict, key: str = 'live_stock_board'):
+        conn = None
+        try:
+            conn = get_connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO bot_settings (key, value) VALUES (?, ?)",
+                (key, json.dumps(state))
+            )
+            conn.commit()
+        except Exception as e:
+            self.logger.error(f"Error saving {key}: {e}")
+        finally:
+            if conn:
+                conn.close()
+
     async def cleanup(self):
         """Cleanup resources"""
         self._cache.clear()
\ No newline at end of file
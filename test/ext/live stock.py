@@ -3,28 +3,49 @@ from discord.ext import commands, tasks
 import logging
 import asyncio
 import json
+import time
 from datetime import datetime
+from typing import Dict, List
 
-from .live_service import LiveStockService
+from .live_service import BoardTarget, LiveStockService, StockBoardLayout
 from .live_views import StockView
-from .constants import UPDATE_INTERVAL
+from .outbound import OutboundDispatcher
+from .constants import (
+    LIVE_STOCK_FALLBACK_INTERVAL,
+    LIVE_STOCK_DEBOUNCE,
+    LIVE_STOCK_MIN_EDIT_INTERVAL,
+    LIVE_STOCK_HEARTBEAT,
+    OUTBOUND_BOARD
+)
 
 # Load config
 with open('config.json') as config_file:
     config = json.load(config_file)
     LIVE_STOCK_CHANNEL_ID = int(config['id_live_stock'])
+    # Mirrors in other channels or partner guilds; the main channel is always first
+    LIVE_STOCK_CHANNEL_IDS = list(dict.fromkeys(
+        [LIVE_STOCK_CHANNEL_ID] + [int(channel_id) for channel_id in config.get('live_stock_channels', [])]
+    ))
 
 class LiveStock(commands.Cog):
     def __init__(self, bot):
         if not hasattr(bot, 'live_stock_instance'):
             self.bot = bot
-            self.message_id = None
+            self.targets = [BoardTarget(channel_id) for channel_id in LIVE_STOCK_CHANNEL_IDS]
+            self.layout = StockBoardLayout()
             self.update_lock = asyncio.Lock()
             self.last_update = datetime.utcnow().timestamp()
+            self.last_edit = 0.0
+            self.skipped_edits = 0
+            self.last_render_ms = 0.0
             self.service = LiveStockService(bot)
             self.stock_view = StockView(bot)
+            self.outbound = OutboundDispatcher(bot)
             self.logger = logging.getLogger("LiveStock")
             self._task = None
+            self._dirty = False
+            self._state_loaded = False
+            self._saved_layout = None
             
             bot.add_view(self.stock_view)
             bot.live_stock_instance = self
@@ -42,37 +63,168 @@ class LiveStock(commands.Cog):
             self.live_stock.cancel()
         self.logger.info("LiveStock cog unloaded")
 
-    @tasks.loop(seconds=UPDATE_INTERVAL)
+    @commands.Cog.listener()
+    async def on_stock_changed(self, product_code=None):
+        self.request_refresh()
+
+    def request_refresh(self):
+        """Schedule a debounced board refresh; bursts of changes share one edit"""
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._debounced_refresh())
+
+    async def _debounced_refresh(self):
+        while self._dirty:
+            # Wait out the debounce window and the minimum gap since the last edit
+            delay = max(LIVE_STOCK_DEBOUNCE, self.last_edit + LIVE_STOCK_MIN_EDIT_INTERVAL - time.monotonic())
+            await asyncio.sleep(delay)
+            self._dirty = False
+            await self.refresh()
+
+    async def _load_state(self):
+        """Pick up the board messages posted before a restart"""
+        # Boards saved before mirrors existed kept everything under one key
+        legacy = await self.service.load_board_state()
+        layout = await self.service.load_board_state('live_stock_layout')
+        self.layout.assignments = layout.get('layout', legacy.get('layout', {}))
+        self._saved_layout = layout or None
+        for target in self.targets:
+            state = await self.service.load_board_state(target.state_key)
+            if not state and legacy.get('channel_id') == target.channel_id:
+                state = {'message_ids': legacy.get('message_ids', [])}
+            target.message_ids = state.get('message_ids', [])
+            target.saved_state = state or None
+        self._state_loaded = True
+
+    async def _save_state(self):
+        layout = {'layout': dict(self.layout.assignments)}
+        if layout != self._saved_layout:
+            await self.service.save_board_state(layout, 'live_stock_layout')
+            self._saved_layout = layout
+        for target in self.targets:
+            state = {'message_ids': list(target.message_ids)}
+            if state != target.saved_state:
+                await self.service.save_board_state(state, target.state_key)
+                target.saved_state = state
+
+    @tasks.loop(seconds=LIVE_STOCK_FALLBACK_INTERVAL)
     async def live_stock(self):
+        await self.refresh()
+
+    async def refresh(self):
+        """Render the board once and bring every target channel up to date"""
         async with self.update_lock:
             try:
-                channel = self.bot.get_channel(LIVE_STOCK_CHANNEL_ID)
-                if not channel:
-                    self.logger.error(f"Could not find channel with ID {LIVE_STOCK_CHANNEL_ID}")
+                if not self._state_loaded:
+                    await self._load_state()
+
+                now = time.monotonic()
+                targets = [target for target in self.targets if now >= target.retry_at]
+                if not targets:
                     return
 
-                products = await self.service.product_manager.get_all_products()
-                embed = await self.service.create_stock_embed(products)
+                started = time.perf_counter()
+                products = await self.service.product_manager.get_stock_snapshot()
+                pages = self.layout.assign(products, self.service.field_size) or [[]]
+                fingerprints = [
+                    f"{len(pages)}:{self.service.stock_fingerprint(page)}" for page in pages
+                ]
+                changes = {}
+                for target in targets:
+                    heartbeat = now - target.last_edit >= LIVE_STOCK_HEARTBEAT
+                    changed = target.changed_pages(fingerprints, heartbeat)
+                    if changed or len(target.message_ids) != len(pages):
+                        changes[target.channel_id] = changed
+                if not changes:
+                    # Nothing on the board changed; keep the rate limit budget for users
+                    self.skipped_edits += 1
+                    return
 
-                if self.message_id:
-                    try:
-                        message = await channel.fetch_message(self.message_id)
-                        await message.edit(embed=embed, view=self.stock_view)
-                        self.logger.debug(f"Updated existing message {self.message_id}")
-                    except discord.NotFound:
-                        message = await channel.send(embed=embed, view=self.stock_view)
-                        self.message_id = message.id
-                        self.logger.info(f"Created new message {self.message_id} (old not found)")
-                else:
-                    message = await channel.send(embed=embed, view=self.stock_view)
-                    self.message_id = message.id
-                    self.logger.info(f"Created initial message {self.message_id}")
+                # Each page is rendered once and the embed shared by every channel showing it
+                needed = sorted(set().union(*changes.values()))
+                embeds = {
+                    index: await self.service.create_stock_embed(pages[index], index + 1, len(pages))
+                    for index in needed
+                }
+                self.last_render_ms = (time.perf_counter() - started) * 1000
+                self.logger.debug(
+                    f"Rendered {len(needed)}/{len(pages)} pages of {len(products)} products "
+                    f"for {len(changes)} channels in {self.last_render_ms:.2f}ms"
+                )
 
+                await asyncio.gather(*(
+                    self._update_target(target, changes[target.channel_id], embeds, fingerprints)
+                    for target in targets if target.channel_id in changes
+                ))
+
+                await self._save_state()
                 self.last_update = datetime.utcnow().timestamp()
+                self.last_edit = time.monotonic()
+
+                # Channels that failed get another go once their backoff expires
+                pending = [target.retry_at for target in self.targets if target.retry_at > self.last_edit]
+                if pending:
+                    asyncio.get_running_loop().call_later(min(pending) - self.last_edit, self.request_refresh)
 
             except Exception as e:
                 self.logger.error(f"Error updating live stock: {e}")
 
+    async def _update_target(self, target: BoardTarget, changed: List[int], embeds: Dict, fingerprints: List[str]):
+        """Apply the changed pages to one channel; failures only delay this channel"""
+        channel = self.bot.get_channel(target.channel_id)
+        if not channel:
+            delay = target.back_off(time.monotonic())
+            self.logger.error(f"Could not find channel with ID {target.channel_id}, retrying in {delay:.0f}s")
+            return
+
+        route = f"channel:{target.channel_id}"
+        if len(target.page_fingerprints) < len(fingerprints):
+            target.page_fingerprints.extend([None] * (len(fingerprints) - len(target.page_fingerprints)))
+        try:
+            for index in changed:
+                # The first page carries the buttons
+                view = self.stock_view if index == 0 else None
+                if index < len(target.message_ids):
+                    try:
+                        # Edit by ID; no fetch round trip first
+                        message = channel.get_partial_message(target.message_ids[index])
+                        await self.outbound.submit(
+                            route, lambda: message.edit(embed=embeds[index], view=view),
+                            OUTBOUND_BOARD, key=f"edit:{message.id}"
+                        )
+                        self.logger.debug(f"Updated page {index + 1} message {target.message_ids[index]} in {target.channel_id}")
+                    except discord.NotFound:
+                        message = await self.outbound.submit(
+                            route, lambda: channel.send(embed=embeds[index], view=view), OUTBOUND_BOARD
+                        )
+                        target.message_ids[index] = message.id
+                        self.logger.info(f"Created new page {index + 1} message {message.id} in {target.channel_id} (old not found)")
+                else:
+                    message = await self.outbound.submit(
+                        route, lambda: channel.send(embed=embeds[index], view=view), OUTBOUND_BOARD
+                    )
+                    target.message_ids.append(message.id)
+                    self.logger.info(f"Created page {index + 1} message {message.id} in {target.channel_id}")
+                target.page_fingerprints[index] = fingerprints[index]
+
+            # Catalog shrank: remove the pages that are no longer needed
+            for message_id in target.message_ids[len(fingerprints):]:
+                try:
+                    stale = channel.get_partial_message(message_id)
+                    await self.outbound.submit(route, stale.delete, OUTBOUND_BOARD)
+                except discord.NotFound:
+                    pass
+            del target.message_ids[len(fingerprints):]
+            del target.page_fingerprints[len(fingerprints):]
+
+            target.failures = 0
+            target.last_edit = time.monotonic()
+
+        except discord.HTTPException as e:
+            # discord.py already retries short 429s; this is a channel that keeps failing
+            delay = target.back_off(time.monotonic(), getattr(e, 'retry_after', None))
+            self.logger.warning(f"Live stock update for channel {target.channel_id} failed ({e}), retrying in {delay:.0f}s")
+
     @live_stock.before_loop
     async def before_live_stock(self):
         await self.bot.wait_until_ready()
@@ -1,8 +1,6 @@
 import discord
 from discord import ui
-from discord.ext import tasks
 import logging
-import time
 from datetime import datetime
 
 from .balance_manager import BalanceManagerService
@@ -10,6 +8,7 @@ from .product_manager import ProductManagerService
 from .trx import TransactionManager
 from .live_modals import BuyModal, SetGrowIDModal
 from .constants import COOLDOWN_SECONDS
+from utils.cooldowns import get_cooldown_store
 
 class StockView(ui.View):
     def __init__(self, bot):
@@ -18,50 +17,21 @@ class StockView(ui.View):
         self.balance_manager = BalanceManagerService(bot)
         self.product_manager = ProductManagerService(bot)
         self.trx_manager = TransactionManager(bot)
-        self._cooldowns = {}
-        self._interaction_locks = {}
+        self.cooldowns = get_cooldown_store(bot)
         self.logger = logging.getLogger("StockView")
-        self._cache_cleanup.start()
-
-    @tasks.loop(minutes=5)
-    async def _cache_cleanup(self):
-        """Cleanup expired cache entries"""
-        current_time = time.time()
-        self._cooldowns = {
-            k: v for k, v in self._cooldowns.items()
-            if current_time - v < COOLDOWN_SECONDS
-        }
-        self._interaction_locks = {
-            k: v for k, v in self._interaction_locks.items()
-            if current_time - v < 1.0
-        }
 
     async def _check_cooldown(self, interaction: discord.Interaction) -> bool:
-        user_id = interaction.user.id
-        current_time = time.time()
-        
-        if user_id in self._cooldowns:
-            remaining = COOLDOWN_SECONDS - (current_time - self._cooldowns[user_id])
-            if remaining > 0:
-                await interaction.response.send_message(
-                    f"⏳ Please wait {remaining:.1f} seconds...",
-                    ephemeral=True
-                )
-                return False
-        
-        self._cooldowns[user_id] = current_time
-        return True
+        allowed, remaining = self.cooldowns.try_acquire(('button', interaction.user.id), COOLDOWN_SECONDS)
+        if not allowed:
+            await interaction.response.send_message(
+                f"⏳ Please wait {remaining:.1f} seconds...",
+                ephemeral=True
+            )
+        return allowed
 
     async def _check_interaction_lock(self, interaction: discord.Interaction) -> bool:
-        user_id = interaction.user.id
-        current_time = time.time()
-        
-        if user_id in self._interaction_locks:
-            if current_time - self._interaction_locks[user_id] < 1.0:
-                return False
-        
-        self._interaction_locks[user_id] = current_time
-        return True
+        allowed, _ = self.cooldowns.try_acquire(('button_lock', interaction.user.id), 1.0)
+        return allowed
 
     async def _safe_interaction_response(self, interaction: discord.Interaction, **kwargs):
         try:
@@ -0,0 +1,246 @@
+import logging
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import discord
+
+from utils.rate_limiter import TokenBucket
+from .constants import (
+    OUTBOUND_PRIORITIES,
+    OUTBOUND_INTERACTIVE,
+    OUTBOUND_RESERVE,
+    OUTBOUND_LOG,
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_ROUTE_RATE,
+    OUTBOUND_MAX_IN_FLIGHT,
+    OUTBOUND_LATENCY_SAMPLES,
+    OUTBOUND_MAX_IDLE_ROUTES
+)
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+class RouteBudget(TokenBucket):
+    """Token bucket for one Discord route that can be held after a 429"""
+    __slots__ = ()
+
+    def wait_time(self, now: float, reserve: float = 0.0) -> float:
+        # A paused bucket only starts refilling at ``updated``
+        start = max(now, self.updated)
+        return (start - now) + super().wait_time(start, reserve)
+
+    def pause(self, now: float, seconds: float):
+        """Hold the route after Discord reported it rate limited"""
+        self.tokens = 0.0
+        self.updated = max(self.updated, now + seconds)
+
+    def is_idle(self, now: float) -> bool:
+        return self.available(now) >= self.capacity
+
+class OutboundJob:
+    """A queued Discord call and everyone waiting on its result"""
+    __slots__ = ('priority', 'route', 'call', 'key', 'futures', 'enqueued')
+
+    def __init__(self, priority: str, route: str, call: Callable[[], Awaitable[Any]], key: Optional[str]):
+        self.priority = priority
+        self.route = route
+        self.call = call
+        self.key = key
+        self.futures: List[asyncio.Future] = []
+        self.enqueued = time.monotonic()
+
+class OutboundDispatcher:
+    """Single scheduler for outgoing Discord calls.
+
+    Calls are queued by priority class and run highest class first. Each
+    route (a channel or DM) has its own token bucket and all routes share a
+    global one; lower classes stop taking global tokens while the bucket is
+    below their reserve, so logs and broadcasts absorb the throttling and
+    receipts keep moving. Interactive calls also ignore the in-flight cap,
+    so slow log or broadcast sends never hold them back. Interaction
+    responses and followups do not count against the bot's global limit and
+    are sent directly, not through here. A call queued with a ``key`` that
+    is still waiting replaces the earlier call, so repeated edits of the same
+    message collapse into one.
+    """
+    _instance = None
+
+    def __new__(cls, bot):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self, bot):
+        if not self.initialized:
+            self.bot = bot
+            self.logger = logging.getLogger("OutboundDispatcher")
+            self.max_in_flight = OUTBOUND_MAX_IN_FLIGHT
+            self._queues: Dict[str, Deque[OutboundJob]] = {priority: deque() for priority in OUTBOUND_PRIORITIES}
+            self._keyed: Dict[str, OutboundJob] = {}
+            self._routes: Dict[str, RouteBudget] = {}
+            self._global = RouteBudget(*OUTBOUND_GLOBAL_RATE)
+            self._stats = {
+                priority: {'sent': 0, 'failed': 0, 'coalesced': 0, 'waits': deque(maxlen=OUTBOUND_LATENCY_SAMPLES)}
+                for priority in OUTBOUND_PRIORITIES
+            }
+            self._in_flight = 0
+            self._wakeup = asyncio.Event()
+            self._worker = None
+            self.initialized = True
+
+    async def submit(self, route: str, call: Callable[[], Awaitable[Any]],
+                     priority: str = OUTBOUND_LOG, key: Optional[str] = None) -> Any:
+        """Queue ``call`` and wait for its result.
+
+        ``call`` is a zero-argument coroutine function so a coalesced call is
+        never started. Exceptions raised by the call are raised here.
+        """
+        future = asyncio.get_running_loop().create_future()
+        job = self._keyed.get(key) if key else None
+        if job is not None:
+            job.call = call
+            self._stats[job.priority]['coalesced'] += 1
+        else:
+            job = OutboundJob(priority, route, call, key)
+            self._queues[priority].append(job)
+            if key:
+                self._keyed[key] = job
+        job.futures.append(future)
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return await future
+
+    def send_later(self, route: str, call: Callable[[], Awaitable[Any]],
+                   priority: str = OUTBOUND_LOG, key: Optional[str] = None) -> asyncio.Task:
+        """Queue a call without waiting for it; failures are only logged"""
+        task = asyncio.create_task(self.submit(route, call, priority, key))
+        task.add_done_callback(self._log_failure)
+        return task
+
+    def _log_failure(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            self.logger.warning(f"Background Discord call failed: {task.exception()}")
+
+    def _route(self, route: str) -> RouteBudget:
+        budget = self._routes.get(route)
+        if budget is None:
+            if len(self._routes) >= OUTBOUND_MAX_IDLE_ROUTES:
+                now = time.monotonic()
+                busy = {job.route for queue in self._queues.values() for job in queue}
+                for name in [name for name, b in self._routes.items() if name not in busy and b.is_idle(now)]:
+                    del self._routes[name]
+            budget = self._routes[route] = RouteBudget(*OUTBOUND_ROUTE_RATE)
+        return budget
+
+    def _next_job(self) -> Tuple[Optional[OutboundJob], Optional[float]]:
+        """Pick the next runnable job, or how long to sleep before one can run"""
+        saturated = self._in_flight >= self.max_in_flight
+        if saturated and not self._queues[OUTBOUND_INTERACTIVE]:
+            return None, None
+        now = time.monotonic()
+        delay = None
+        for priority in OUTBOUND_PRIORITIES:
+            if saturated and priority != OUTBOUND_INTERACTIVE:
+                break
+            queue = self._queues[priority]
+            if not queue:
+                continue
+            reserve = self._global.capacity * OUTBOUND_RESERVE[priority]
+            if self._global.available(now) < reserve + 1:
+                wait = self._global.wait_time(now, reserve)
+                delay = wait if delay is None else min(delay, wait)
+                # Reserves only grow down the list, so nothing below can run either
+                break
+            blocked = set()
+            for index, job in enumerate(queue):
+                if job.route in blocked:
+                    continue
+                budget = self._route(job.route)
+                if budget.available(now) >= 1:
+                    del queue[index]
+                    if job.key and self._keyed.get(job.key) is job:
+                        del self._keyed[job.key]
+                    budget.take(now)
+                    self._global.take(now)
+                    return job, None
+                blocked.add(job.route)
+                wait = budget.wait_time(now)
+                delay = wait if delay is None else min(delay, wait)
+        return None, delay
+
+    async def _run(self):
+        while True:
+            job, delay = self._next_job()
+            if job is None:
+                if delay is None and not any(self._queues.values()) and not self._in_flight:
+                    return
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._in_flight += 1
+            asyncio.create_task(self._execute(job))
+
+    async def _execute(self, job: OutboundJob):
+        stats = self._stats[job.priority]
+        stats['waits'].append(time.monotonic() - job.enqueued)
+        try:
+            result = await job.call()
+        except Exception as e:
+            stats['failed'] += 1
+            retry_after = getattr(e, 'retry_after', None)
+            if isinstance(e, discord.HTTPException) and e.status == 429 and retry_after:
+                self._route(job.route).pause(time.monotonic(), retry_after)
+            for future in job.futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            stats['sent'] += 1
+            for future in job.futures:
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._in_flight -= 1
+            self._wakeup.set()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Queue depth, counters and queue wait (ms) per priority class"""
+        return {
+            priority: {
+                'queued': len(self._queues[priority]),
+                'sent': stats['sent'],
+                'failed': stats['failed'],
+                'coalesced': stats['coalesced'],
+                'wait_p50_ms': _percentile(stats['waits'], 50) * 1000,
+                'wait_p95_ms': _percentile(stats['waits'], 95) * 1000
+            }
+            for priority, stats in self._stats.items()
+        }
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def shutdown(self):
+        """Stop the scheduler; queued calls are dropped"""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+        for queue in self._queues.values():
+            for job in queue:
+                for future in job.futures:
+                    if not future.done():
+                        future.cancel()
+            queue.clear()
+        self._keyed.clear()
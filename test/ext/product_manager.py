@@ -1,14 +1,40 @@
 import logging
 import asyncio
 import time
-from typing import Dict, List, Optional
+import json
+import re
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Union
 from datetime import datetime
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
-from .constants import STATUS_AVAILABLE, TransactionError
-from database import get_connection
+from .constants import (
+    STATUS_AVAILABLE,
+    STATUS_SOLD,
+    STATUS_DELETED,
+    STOCK_IMPORT_CHUNK_SIZE,
+    STOCK_ARCHIVE_SOLD_AGE_DAYS,
+    STOCK_ARCHIVE_CHUNK_SIZE,
+    STOCK_ARCHIVE_INTERVAL_HOURS,
+    STOCK_CODEC_SAMPLE_SIZE,
+    EXPORT_FETCH_SIZE,
+    STOCK_BLOOM_CAPACITY,
+    STOCK_BLOOM_ERROR_RATE,
+    STOCK_BLOOM_BLOCK_SIZE,
+    STOCK_BLOOM_STALE_RATIO,
+    RULE_REGEX,
+    RULE_FIELDS,
+    RULE_LENGTH,
+    RULE_ACTION_REJECT,
+    RULE_ACTION_QUARANTINE,
+    TransactionError
+)
+from .admission import PurchaseAdmissionController
+from .stock_codec import StockCodec
+from .bloom import BloomFilter
+from .stock_validation import StockValidator
+from database import get_connection, content_digest
 
 class ProductManagerService:
     _instance = None
@@ -26,6 +52,9 @@ class ProductManagerService:
             self._cache = {}
             self._cache_timeout = 60
             self._locks = {}
+            self._codec = None
+            self._bloom = None
+            self._bloom_meta = {}
             self.initialized = True
 
     async def _get_lock(self, key: str) -> asyncio.Lock:
@@ -84,6 +113,7 @@ class ProductManagerService:
                 # Update cache
                 self._set_cached(f"product_{code}", result)
                 self._cache.pop("all_products", None)  # Invalidate all products cache
+                self._notify_stock_changed(code)
                 
                 self.logger.info(f"Created new product: {code} - {name} at {price} WLs")
                 return result
@@ -155,10 +185,26 @@ class ProductManagerService:
                 if cursor.fetchone()['count'] > 0:
                     raise ValueError("Cannot delete product with existing stock")
                 
+                # Sold/deleted rows go with the product; their filter bits become stale
+                cursor.execute("""
+                    SELECT (SELECT COUNT(*) FROM stock WHERE product_code = ?)
+                         + (SELECT COUNT(*) FROM stock_archive WHERE product_code = ?) as count
+                """, (code, code))
+                removed = cursor.fetchone()['count']
+                if removed:
+                    self.get_stock_bloom()  # load before this connection starts writing
+                
                 cursor.execute("DELETE FROM products WHERE code = ?", (code,))
                 
                 if cursor.rowcount == 0:
                     raise ValueError(f"Product {code} not found")
+                
+                # stock rows cascade; archived rows have no foreign key and go explicitly
+                cursor.execute("DELETE FROM stock_archive WHERE product_code = ?", (code,))
+                
+                if removed:
+                    self._bloom_meta['stale'] += removed
+                    self._save_stock_bloom(cursor)
                     
                 conn.commit()
                 
@@ -232,6 +278,30 @@ class ProductManagerService:
             if conn:
                 conn.close()
 
+    async def get_stock_snapshot(self) -> List[Dict]:
+        """Code, name, price, description and available count of every product in one query"""
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT p.code, p.name, p.price, p.description, COUNT(s.id) as stock_count
+                FROM products p
+                LEFT JOIN stock s ON s.product_code = p.code AND s.status = ?
+                GROUP BY p.code
+                ORDER BY p.code
+            """, (STATUS_AVAILABLE,))
+            
+            return [dict(row) for row in cursor.fetchall()]
+
+        except Exception as e:
+            self.logger.error(f"Error getting stock snapshot: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+
     async def add_stock_item(self, product_code: str, content: str, added_by: str) -> bool:
         if not content.strip():
             raise ValueError("Stock content cannot be empty")
@@ -247,19 +317,27 @@ class ProductManagerService:
                 if not cursor.fetchone():
                     raise ValueError(f"Product {product_code} not found")
                 
+                content = content.strip()
+                digest = content_digest(content)
+                bloom = self.get_stock_bloom()
+                if digest in bloom and self._lookup_stock_hashes(conn, [digest]):
+                    raise ValueError("Stock content already exists")
+                
                 cursor.execute(
                     """
-                    INSERT INTO stock (product_code, content, added_by, status, added_at)
-                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    INSERT INTO stock (product_code, content, content_hash, added_by, status, added_at)
+                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
                     """,
-                    (product_code, content.strip(), added_by, STATUS_AVAILABLE)
+                    (product_code, self.get_stock_codec().encode(content), digest, added_by, STATUS_AVAILABLE)
                 )
+                bloom.add(digest)
+                self._save_stock_bloom(cursor)
                 
                 conn.commit()
                 
                 # Invalidate stock count cache
-                self._cache.pop(f"stock_count_{product_code}", None)
-                self._cache.pop("all_products", None)
+                self.invalidate_stock_cache(product_code)
+                PurchaseAdmissionController(self.bot).mark_available(product_code)
                 
                 self.logger.info(f"Added stock item to {product_code} by {added_by}")
                 return True
@@ -273,6 +351,249 @@ class ProductManagerService:
                 if conn:
                     conn.close()
 
+    async def add_stock_bulk(self, product_code: str, items: Union[Iterable[str], AsyncIterable[str]], added_by: str,
+                             chunk_size: int = STOCK_IMPORT_CHUNK_SIZE,
+                             progress_callback: Optional[Callable[[Dict], Awaitable[None]]] = None) -> Dict:
+        """Insert many stock items with one product check and chunked executemany.
+
+        ``items`` may be a plain or async iterable, so streamed uploads go
+        straight into fixed-size batches. Blank lines are skipped and content
+        already in stock (or archived) is ignored. Each chunk is checked
+        against the product's validation rules first; failing lines are
+        rejected or quarantined. Returns total/inserted/duplicates/rejected/
+        quarantined counts plus failures per rule id under ``rules``;
+        ``progress_callback`` is awaited with the running counts after every
+        committed chunk. Known content is screened out through the stock
+        Bloom filter before it reaches the insert.
+        """
+        stats = {'total': 0, 'inserted': 0, 'duplicates': 0, 'rejected': 0, 'quarantined': 0, 'rules': {}}
+        
+        async with await self._get_lock(f"stock_{product_code}"):
+            conn = None
+            try:
+                conn = get_connection()
+                cursor = conn.cursor()
+                
+                # Verify product exists
+                cursor.execute("SELECT code FROM products WHERE code = ?", (product_code,))
+                if not cursor.fetchone():
+                    raise ValueError(f"Product {product_code} not found")
+                
+                validator = StockValidator(await self.get_validation_rules(product_code))
+                self.get_stock_bloom()  # load before this connection starts writing
+                batch = []
+                async for item in self._iter_items(items):
+                    content = item.strip()
+                    if not content:
+                        continue
+                    batch.append(content)
+                    if len(batch) >= chunk_size:
+                        await self._insert_stock_batch(conn, product_code, batch, added_by, stats,
+                                                       progress_callback, validator)
+                        batch = []
+                if batch:
+                    await self._insert_stock_batch(conn, product_code, batch, added_by, stats,
+                                                   progress_callback, validator)
+                
+                self.logger.info(
+                    f"Bulk added stock to {product_code} by {added_by}: "
+                    f"{stats['inserted']} inserted, {stats['duplicates']} duplicates"
+                )
+                return stats
+
+            except Exception as e:
+                self.logger.error(f"Error bulk adding stock: {e}")
+                if conn:
+                    conn.rollback()
+                raise
+            finally:
+                if conn:
+                    conn.close()
+                # Committed chunks stay committed, so refresh caches once even on failure
+                if stats['inserted']:
+                    self._persist_stock_bloom()
+                    self.invalidate_stock_cache(product_code)
+                    PurchaseAdmissionController(self.bot).mark_available(product_code)
+
+    @staticmethod
+    async def _iter_items(items: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+        if hasattr(items, '__aiter__'):
+            async for item in items:
+                yield item
+        else:
+            for item in items:
+                yield item
+
+    async def _insert_stock_batch(self, conn, product_code: str, batch: List[str], added_by: str, stats: Dict,
+                                  progress_callback: Optional[Callable[[Dict], Awaitable[None]]],
+                                  validator: Optional[StockValidator] = None):
+        bloom = self.get_stock_bloom()
+        stats['total'] += len(batch)
+        if validator:
+            checked = validator.validate(batch)
+            batch = checked['valid']
+            stats['rejected'] += len(checked['rejected'])
+            stats['quarantined'] += len(checked['quarantined'])
+            for rule_id, count in checked['counts'].items():
+                stats['rules'][rule_id] = stats['rules'].get(rule_id, 0) + count
+            conn.executemany(
+                "INSERT INTO stock_quarantine (product_code, content, rule_id, reason, added_by) VALUES (?, ?, ?, ?, ?)",
+                [(product_code, line, rule_id, reason, added_by) for line, rule_id, reason in checked['quarantined']]
+            )
+        
+        codec = self.get_stock_codec()
+        batch = [
+            (product_code, codec.encode(content), content_digest(content), added_by, STATUS_AVAILABLE)
+            for content in batch
+        ]
+        
+        # Only Bloom filter hits can already be stored; confirm those and drop them
+        known = self._lookup_stock_hashes(conn, [row[2] for row in batch if row[2] in bloom])
+        rows = [row for row in batch if row[2] not in known] if known else batch
+        
+        before = conn.total_changes
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO stock (product_code, content, content_hash, added_by, status, added_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """,
+            rows
+        )
+        bloom.update(row[2] for row in rows)
+        conn.commit()
+        
+        inserted = conn.total_changes - before
+        stats['inserted'] += inserted
+        stats['duplicates'] += len(batch) - inserted
+        
+        if progress_callback:
+            await progress_callback(dict(stats, rules=dict(stats['rules'])))
+        else:
+            await asyncio.sleep(0)  # let the event loop breathe between chunks
+
+    async def add_validation_rule(self, product_code: str, rule_type: str, pattern: str = None,
+                                  separator: str = None, min_value: int = None, max_value: int = None,
+                                  action: str = RULE_ACTION_QUARANTINE, created_by: str = None) -> Dict:
+        """Add an import validation rule for a product"""
+        if rule_type not in (RULE_REGEX, RULE_FIELDS, RULE_LENGTH):
+            raise ValueError(f"Rule type must be {RULE_REGEX}, {RULE_FIELDS} or {RULE_LENGTH}")
+        if action not in (RULE_ACTION_REJECT, RULE_ACTION_QUARANTINE):
+            raise ValueError(f"Action must be {RULE_ACTION_REJECT} or {RULE_ACTION_QUARANTINE}")
+        if rule_type == RULE_REGEX:
+            if not pattern:
+                raise ValueError("Regex rules need a pattern")
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid regex: {e}")
+        if rule_type == RULE_FIELDS and not separator:
+            raise ValueError("Field rules need a separator")
+        if rule_type != RULE_REGEX and min_value is None and max_value is None:
+            raise ValueError("Give a minimum and/or maximum")
+        
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT code FROM products WHERE code = ?", (product_code,))
+            if not cursor.fetchone():
+                raise ValueError(f"Product {product_code} not found")
+            
+            cursor.execute("""
+                INSERT INTO product_validation_rules
+                (product_code, rule_type, pattern, separator, min_value, max_value, action, created_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (product_code, rule_type, pattern, separator, min_value, max_value, action, created_by))
+            rule_id = cursor.lastrowid
+            conn.commit()
+            
+            self._cache.pop(f"rules_{product_code}", None)
+            self.logger.info(f"Added {rule_type} validation rule {rule_id} for {product_code}")
+            
+            cursor.execute("SELECT * FROM product_validation_rules WHERE id = ?", (rule_id,))
+            return dict(cursor.fetchone())
+
+        except Exception as e:
+            self.logger.error(f"Error adding validation rule: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if conn:
+                conn.close()
+
+    async def get_validation_rules(self, product_code: str) -> List[Dict]:
+        cache_key = f"rules_{product_code}"
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            return cached
+        
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM product_validation_rules WHERE product_code = ? ORDER BY id",
+                (product_code,)
+            )
+            rules = [dict(row) for row in cursor.fetchall()]
+            self._set_cached(cache_key, rules)
+            return rules
+        finally:
+            if conn:
+                conn.close()
+
+    async def remove_validation_rule(self, rule_id: int) -> bool:
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT product_code FROM product_validation_rules WHERE id = ?", (rule_id,))
+            row = cursor.fetchone()
+            if not row:
+                return False
+            
+            cursor.execute("DELETE FROM product_validation_rules WHERE id = ?", (rule_id,))
+            conn.commit()
+            self._cache.pop(f"rules_{row['product_code']}", None)
+            self.logger.info(f"Removed validation rule {rule_id} from {row['product_code']}")
+            return True
+        finally:
+            if conn:
+                conn.close()
+
+    async def get_quarantine(self, product_code: str, limit: int = 10) -> Dict:
+        """Quarantined line count and the most recent lines for a product"""
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) as count FROM stock_quarantine WHERE product_code = ?", (product_code,))
+            count = cursor.fetchone()['count']
+            cursor.execute("""
+                SELECT id, content, reason, created_at FROM stock_quarantine
+                WHERE product_code = ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (product_code, limit))
+            return {'count': count, 'items': [dict(row) for row in cursor.fetchall()]}
+        finally:
+            if conn:
+                conn.close()
+
+    async def clear_quarantine(self, product_code: str) -> int:
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM stock_quarantine WHERE product_code = ?", (product_code,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            if conn:
+                conn.close()
+
     async def get_available_stock(self, product_code: str, quantity: int = 1) -> List[Dict]:
         try:
             conn = get_connection()
@@ -286,9 +607,10 @@ class ProductManagerService:
                 LIMIT ?
             """, (product_code, STATUS_AVAILABLE, quantity))
             
+            codec = self.get_stock_codec()
             return [{
                 'id': row['id'],
-                'content': row['content'],
+                'content': codec.decode(row['content']),
                 'added_at': row['added_at'],
                 'added_by': row['added_by']
             } for row in cursor.fetchall()]
@@ -357,8 +679,9 @@ class ProductManagerService:
                 cursor.execute("SELECT product_code FROM stock WHERE id = ?", (stock_id,))
                 result = cursor.fetchone()
                 if result:
-                    self._cache.pop(f"stock_count_{result['product_code']}", None)
-                    self._cache.pop("all_products", None)
+                    self.invalidate_stock_cache(result['product_code'])
+                    if status == STATUS_AVAILABLE:
+                        PurchaseAdmissionController(self.bot).mark_available(result['product_code'])
                 
                 self.logger.info(f"Updated stock {stock_id} status to {status}" + (f" for {buyer_id}" if buyer_id else ""))
                 return True
@@ -429,6 +752,442 @@ class ProductManagerService:
                 if conn:
                     conn.close()
 
+    def _lookup_stock_hashes(self, conn, digests: List[bytes]) -> set:
+        """Which of ``digests`` are stored in stock or the archive"""
+        found = set()
+        for table in ('stock', 'stock_archive'):
+            for i in range(0, len(digests), 900):
+                chunk = digests[i:i + 900]
+                cursor = conn.execute(
+                    f"SELECT content_hash FROM {table} WHERE content_hash IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                found.update(row['content_hash'] for row in cursor.fetchall())
+        return found
+
+    def get_stock_bloom(self) -> BloomFilter:
+        """Bloom filter over every stock and archived content hash, loaded on first use.
+
+        Blocks and metadata are persisted in SQLite. Rows added since the last
+        save (say, before a crash) are caught up by stock id; the filter is
+        rebuilt once it is over capacity or too many entries were deleted.
+        """
+        if self._bloom is None:
+            conn = None
+            try:
+                conn = get_connection()
+                cursor = conn.cursor()
+                
+                cursor.execute("SELECT value FROM bot_settings WHERE key = 'stock_bloom'")
+                row = cursor.fetchone()
+                meta = json.loads(row['value']) if row else None
+                
+                if (meta is None or meta['count'] > meta['capacity']
+                        or meta['stale'] > meta['count'] * STOCK_BLOOM_STALE_RATIO):
+                    self._rebuild_stock_bloom(cursor)
+                else:
+                    bloom = BloomFilter(meta['num_bits'], meta['num_hashes'], meta['block_size'], count=meta['count'])
+                    cursor.execute("SELECT block, bits FROM stock_bloom_blocks")
+                    for block in cursor.fetchall():
+                        bloom.load_block(block['block'], block['bits'])
+                    self._bloom, self._bloom_meta = bloom, meta
+                    
+                    cursor.execute(
+                        "SELECT content_hash FROM stock WHERE id > ?",
+                        (meta['last_stock_id'],)
+                    )
+                    if bloom.update(row['content_hash'] for row in cursor.fetchall()):
+                        self._save_stock_bloom(cursor)
+                conn.commit()
+            finally:
+                if conn:
+                    conn.close()
+        return self._bloom
+
+    def _rebuild_stock_bloom(self, cursor):
+        started = time.perf_counter()
+        cursor.execute("SELECT (SELECT COUNT(*) FROM stock) + (SELECT COUNT(*) FROM stock_archive) as count")
+        capacity = max(STOCK_BLOOM_CAPACITY, cursor.fetchone()['count'] * 2)
+        bloom = BloomFilter.for_capacity(capacity, STOCK_BLOOM_ERROR_RATE, STOCK_BLOOM_BLOCK_SIZE)
+        
+        cursor.execute("SELECT content_hash FROM stock UNION ALL SELECT content_hash FROM stock_archive")
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            bloom.update(row['content_hash'] for row in rows)
+        
+        self._bloom = bloom
+        self._bloom_meta = {'capacity': capacity, 'stale': 0}
+        bloom.mark_all_dirty()
+        cursor.execute("DELETE FROM stock_bloom_blocks")
+        self._save_stock_bloom(cursor)
+        self.logger.info(
+            f"Rebuilt stock Bloom filter: {bloom.count} hashes, {len(bloom.bits) / 1024 / 1024:.1f}MB "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    def _save_stock_bloom(self, cursor):
+        """Write changed filter blocks and metadata; the caller commits"""
+        bloom = self._bloom
+        cursor.executemany(
+            "INSERT OR REPLACE INTO stock_bloom_blocks (block, bits) VALUES (?, ?)",
+            bloom.dirty_blocks()
+        )
+        bloom.dirty.clear()
+        
+        cursor.execute("SELECT COALESCE(MAX(id), 0) as last_id FROM stock")
+        self._bloom_meta.update({
+            'num_bits': bloom.num_bits,
+            'num_hashes': bloom.num_hashes,
+            'block_size': bloom.block_size,
+            'count': bloom.count,
+            'last_stock_id': cursor.fetchone()['last_id']
+        })
+        cursor.execute(
+            "INSERT OR REPLACE INTO bot_settings (key, value) VALUES ('stock_bloom', ?)",
+            (json.dumps(self._bloom_meta),)
+        )
+        
+        meta = self._bloom_meta
+        if meta['count'] > meta['capacity'] or meta['stale'] > meta['count'] * STOCK_BLOOM_STALE_RATIO:
+            self._bloom = None  # rebuilt on next use
+
+    def _persist_stock_bloom(self):
+        if self._bloom is None:
+            return
+        conn = None
+        try:
+            conn = get_connection()
+            self._save_stock_bloom(conn.cursor())
+            conn.commit()
+        except Exception as e:
+            # Missed rows are caught up by stock id on the next load
+            self.logger.error(f"Error saving stock Bloom filter: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+    async def preflight_stock(self, items: Union[Iterable[str], AsyncIterable[str]], verify: bool = True) -> Dict:
+        """Count how many items are already stored, without inserting anything.
+
+        Every line is checked against the Bloom filter; with ``verify`` the
+        filter hits are confirmed by hash lookup in chunks.
+        """
+        started = time.perf_counter()
+        bloom = self.get_stock_bloom()
+        stats = {'total': 0, 'probable_duplicates': 0, 'duplicates': 0}
+        
+        conn = None
+        try:
+            conn = get_connection() if verify else None
+            candidates = []
+            async for item in self._iter_items(items):
+                content = item.strip()
+                if not content:
+                    continue
+                stats['total'] += 1
+                digest = content_digest(content)
+                if digest in bloom:
+                    stats['probable_duplicates'] += 1
+                    if verify:
+                        candidates.append(digest)
+                        if len(candidates) >= 900:
+                            found = self._lookup_stock_hashes(conn, candidates)
+                            stats['duplicates'] += sum(1 for digest in candidates if digest in found)
+                            candidates = []
+            if candidates:
+                found = self._lookup_stock_hashes(conn, candidates)
+                stats['duplicates'] += sum(1 for digest in candidates if digest in found)
+        finally:
+            if conn:
+                conn.close()
+        
+        if not verify:
+            stats['duplicates'] = stats['probable_duplicates']
+        stats['new'] = stats['total'] - stats['duplicates']
+        stats['error_rate'] = bloom.estimated_error_rate()
+        stats['elapsed'] = time.perf_counter() - started
+        return stats
+
+    def get_stock_codec(self) -> StockCodec:
+        """Codec used to store stock content, loaded from bot_settings on first use"""
+        if self._codec is None:
+            conn = None
+            try:
+                conn = get_connection()
+                cursor = conn.cursor()
+                
+                cursor.execute(
+                    "SELECT key, value FROM bot_settings WHERE key IN ('stock_compression', 'stock_codec_dict')"
+                )
+                settings = {row['key']: row['value'] for row in cursor.fetchall()}
+                cursor.execute("SELECT id, dictionary FROM stock_codec_dicts")
+                dictionaries = {row['id']: bytes(row['dictionary']) for row in cursor.fetchall()}
+                
+                self._codec = StockCodec(
+                    enabled=settings.get('stock_compression') == '1',
+                    dictionaries=dictionaries,
+                    active_dict_id=int(settings.get('stock_codec_dict', 0))
+                )
+            finally:
+                if conn:
+                    conn.close()
+        return self._codec
+
+    def _save_codec_setting(self, cursor, key: str, value: str):
+        cursor.execute(
+            "INSERT OR REPLACE INTO bot_settings (key, value) VALUES (?, ?)",
+            (key, value)
+        )
+
+    async def set_stock_compression(self, enabled: bool) -> bool:
+        """Turn compression of newly added stock content on or off"""
+        async with await self._get_lock("stock_codec"):
+            conn = None
+            try:
+                conn = get_connection()
+                self._save_codec_setting(conn.cursor(), 'stock_compression', '1' if enabled else '0')
+                conn.commit()
+                self._codec = None
+                self.logger.info(f"Stock compression {'enabled' if enabled else 'disabled'}")
+                return True
+            finally:
+                if conn:
+                    conn.close()
+
+    async def train_stock_dictionary(self, sample_size: int = STOCK_CODEC_SAMPLE_SIZE) -> Dict:
+        """Train a shared zlib dictionary on recent stock rows and make it active"""
+        async with await self._get_lock("stock_codec"):
+            conn = None
+            try:
+                codec = self.get_stock_codec()
+                conn = get_connection()
+                cursor = conn.cursor()
+                
+                cursor.execute("SELECT content FROM stock ORDER BY id DESC LIMIT ?", (sample_size,))
+                samples = [codec.decode(row['content']) for row in cursor.fetchall()]
+                if not samples:
+                    raise ValueError("No stock content to train on")
+                
+                dictionary = StockCodec.train_dictionary(samples)
+                if not dictionary:
+                    raise ValueError("Stock content has no repeating patterns to build a dictionary from")
+                
+                cursor.execute(
+                    "INSERT INTO stock_codec_dicts (dictionary, sample_size) VALUES (?, ?)",
+                    (dictionary, len(samples))
+                )
+                dict_id = cursor.lastrowid
+                self._save_codec_setting(cursor, 'stock_codec_dict', str(dict_id))
+                conn.commit()
+                self._codec = None
+                
+                self.logger.info(f"Trained stock codec dictionary {dict_id}: {len(dictionary)} bytes from {len(samples)} rows")
+                return {'dict_id': dict_id, 'size': len(dictionary), 'samples': len(samples)}
+
+            except Exception as e:
+                self.logger.error(f"Error training stock dictionary: {e}")
+                if conn:
+                    conn.rollback()
+                raise
+            finally:
+                if conn:
+                    conn.close()
+
+    async def compress_existing_stock(self, chunk_size: int = STOCK_IMPORT_CHUNK_SIZE) -> Dict:
+        """Re-encode available plain-text stock rows with the current codec"""
+        codec = self.get_stock_codec()
+        if not codec.enabled:
+            raise ValueError("Stock compression is disabled")
+        
+        stats = {'scanned': 0, 'compressed': 0}
+        last_id = 0
+        async with await self._get_lock("stock_codec"):
+            conn = None
+            try:
+                conn = get_connection()
+                cursor = conn.cursor()
+                
+                while True:
+                    cursor.execute("""
+                        SELECT id, content FROM stock
+                        WHERE id > ? AND status = ? AND typeof(content) = 'text'
+                        ORDER BY id
+                        LIMIT ?
+                    """, (last_id, STATUS_AVAILABLE, chunk_size))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    
+                    updates = []
+                    for row in rows:
+                        encoded = codec.encode(row['content'])
+                        if not isinstance(encoded, str):
+                            updates.append((encoded, row['id']))
+                    cursor.executemany("UPDATE stock SET content = ?, updated_at = updated_at WHERE id = ?", updates)
+                    conn.commit()
+                    
+                    stats['scanned'] += len(rows)
+                    stats['compressed'] += len(updates)
+                    last_id = rows[-1]['id']
+                    await asyncio.sleep(0)
+                
+                self.logger.info(f"Compressed {stats['compressed']} of {stats['scanned']} plain stock rows")
+                return stats
+
+            except Exception as e:
+                self.logger.error(f"Error compressing stock: {e}")
+                if conn:
+                    conn.rollback()
+                raise
+            finally:
+                if conn:
+                    conn.close()
+
+    async def get_stock_codec_stats(self) -> Dict:
+        """Compression setting, stored row mix and database size"""
+        codec = self.get_stock_codec()
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT SUM(typeof(content) = 'blob') as compressed,
+                       SUM(typeof(content) = 'text') as plain,
+                       SUM(length(content)) as stored_bytes
+                FROM stock
+            """)
+            row = cursor.fetchone()
+            cursor.execute("PRAGMA page_count")
+            page_count = cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_size")
+            page_size = cursor.fetchone()[0]
+            
+            return {
+                'enabled': codec.enabled,
+                'dict_id': codec.active_dict_id,
+                'compressed_rows': row['compressed'] or 0,
+                'plain_rows': row['plain'] or 0,
+                'stored_bytes': row['stored_bytes'] or 0,
+                'db_bytes': page_count * page_size
+            }
+        finally:
+            if conn:
+                conn.close()
+
+    STOCK_EXPORT_COLUMNS = ('id', 'product_code', 'content', 'status', 'added_by',
+                            'buyer_id', 'added_at', 'updated_at')
+
+    def iter_stock_export(self, product_code: Optional[str] = None, status: Optional[str] = None,
+                          fetch_size: int = EXPORT_FETCH_SIZE) -> Iterator[tuple]:
+        """Yield stock rows (archived included) in STOCK_EXPORT_COLUMNS order.
+
+        Rows are fetched ``fetch_size`` at a time and content is decoded on
+        the way out. Blocking; iterate it off the event loop.
+        """
+        conditions, params = [], []
+        if product_code:
+            conditions.append("product_code = ?")
+            params.append(product_code)
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        codec = self.get_stock_codec()
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {', '.join(self.STOCK_EXPORT_COLUMNS)}
+                FROM stock_all
+                {where}
+                ORDER BY id
+            """, params)
+            
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    row = tuple(row)
+                    yield row[:2] + (codec.decode(row[2]),) + row[3:]
+        finally:
+            if conn:
+                conn.close()
+
+    async def archive_stock(self, sold_age_days: int = STOCK_ARCHIVE_SOLD_AGE_DAYS,
+                            chunk_size: int = STOCK_ARCHIVE_CHUNK_SIZE) -> Dict:
+        """Move old sold rows and all deleted rows from stock into stock_archive.
+
+        Works in chunks of ``chunk_size`` rows, one transaction each, so the
+        hot stock table only holds live inventory and recent sales.
+        """
+        columns = "id, product_code, content, content_hash, status, added_by, buyer_id, seller_id, added_at, updated_at"
+        archived = 0
+        
+        async with await self._get_lock("stock_archive"):
+            conn = None
+            try:
+                conn = get_connection()
+                cursor = conn.cursor()
+                
+                while True:
+                    cursor.execute("BEGIN IMMEDIATE")
+                    cursor.execute("""
+                        SELECT id FROM stock
+                        WHERE (status = ? AND updated_at < datetime('now', ?))
+                           OR status = ?
+                        ORDER BY id
+                        LIMIT ?
+                    """, (STATUS_SOLD, f"{-sold_age_days} days", STATUS_DELETED, chunk_size))
+                    ids = [row['id'] for row in cursor.fetchall()]
+                    if not ids:
+                        conn.commit()
+                        break
+                    
+                    placeholders = ','.join('?' * len(ids))
+                    cursor.execute(
+                        f"INSERT OR REPLACE INTO stock_archive ({columns}) "
+                        f"SELECT {columns} FROM stock WHERE id IN ({placeholders})",
+                        ids
+                    )
+                    cursor.execute(f"DELETE FROM stock WHERE id IN ({placeholders})", ids)
+                    conn.commit()
+                    archived += len(ids)
+                    
+                    if len(ids) < chunk_size:
+                        break
+                    await asyncio.sleep(0)
+                
+                if archived:
+                    self.logger.info(f"Archived {archived} sold/deleted stock rows")
+                return {'archived': archived}
+
+            except Exception as e:
+                self.logger.error(f"Error archiving stock: {e}")
+                if conn:
+                    conn.rollback()
+                raise
+            finally:
+                if conn:
+                    conn.close()
+
+    def _notify_stock_changed(self, product_code: Optional[str] = None):
+        """Dispatch ``stock_changed`` so listeners such as the live board can refresh"""
+        dispatch = getattr(self.bot, 'dispatch', None)
+        if dispatch:
+            dispatch('stock_changed', product_code)
+
+    def invalidate_stock_cache(self, product_code: str):
+        """Invalidate cached stock counts after stock for a product changed"""
+        self._cache.pop(f"stock_count_{product_code}", None)
+        self._cache.pop("all_products", None)
+        self._notify_stock_changed(product_code)
+
     def invalidate_cache(self, product_code: str = None):
         """Invalidate cache for specific product or all products"""
         if product_code:
@@ -437,6 +1196,7 @@ class ProductManagerService:
                 del self._cache[key]
         else:
             self._cache.clear()
+        self._notify_stock_changed(product_code)
 
     async def cleanup(self):
         """Cleanup resources"""
@@ -451,13 +1211,27 @@ class ProductManagerCog(commands.Cog):
 
     async def cog_load(self):
         """Called when the cog is loaded"""
+        self.archive_stock_task.start()
         self.logger.info("ProductManagerCog loading...")
 
     async def cog_unload(self):
         """Called when the cog is unloaded"""
+        self.archive_stock_task.cancel()
         await self.product_service.cleanup()
         self.logger.info("ProductManagerCog unloaded")
 
+    @tasks.loop(hours=STOCK_ARCHIVE_INTERVAL_HOURS)
+    async def archive_stock_task(self):
+        """Periodically move sold and deleted rows out of the hot stock table"""
+        try:
+            await self.product_service.archive_stock()
+        except Exception as e:
+            self.logger.error(f"Stock archival failed: {e}")
+
+    @archive_stock_task.before_loop
+    async def before_archive_stock(self):
+        await self.bot.wait_until_ready()
+
 async def setup(bot):
     """Setup the ProductManager cog"""
     try:
@@ -0,0 +1,93 @@
+import re
+import struct
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Optional, Union
+
+from .constants import STOCK_COMPRESSION_LEVEL, STOCK_CODEC_DICT_SIZE
+
+CODEC_ZLIB = 1
+_HEADER = struct.Struct('>BH')  # codec id, dictionary id (0 = none)
+_TOKEN_SPLIT = re.compile(r'([\s:|@,;/=]+)')
+
+class StockCodec:
+    """Optional at-rest compression for stock content.
+
+    Compressed values are stored as BLOBs: a 3-byte header (codec, dictionary
+    id) followed by raw deflate data. Plain TEXT values pass through decode
+    untouched, so compressed and uncompressed rows can live side by side and
+    the codec can be switched on or off at any time.
+    """
+
+    def __init__(self, enabled: bool = False, dictionaries: Optional[Dict[int, bytes]] = None,
+                 active_dict_id: int = 0, level: int = STOCK_COMPRESSION_LEVEL):
+        self.enabled = enabled
+        self.dictionaries = dictionaries or {}
+        self.active_dict_id = active_dict_id if active_dict_id in self.dictionaries else 0
+        self.level = level
+
+    def encode(self, content: str) -> Union[str, bytes]:
+        """Compress content for storage, keeping it as text when that is smaller"""
+        if not self.enabled:
+            return content
+
+        raw = content.encode('utf-8')
+        zdict = self.dictionaries.get(self.active_dict_id)
+        if zdict:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        packed = _HEADER.pack(CODEC_ZLIB, self.active_dict_id if zdict else 0)
+        packed += compressor.compress(raw) + compressor.flush()
+
+        return packed if len(packed) < len(raw) else content
+
+    def decode(self, value: Union[str, bytes]) -> str:
+        """Return the plain text of a stored stock value"""
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            return value
+
+        value = bytes(value)
+        codec, dict_id = _HEADER.unpack_from(value)
+        if codec != CODEC_ZLIB:
+            raise ValueError(f"Unknown stock codec {codec}")
+
+        if dict_id:
+            zdict = self.dictionaries.get(dict_id)
+            if zdict is None:
+                raise ValueError(f"Missing stock codec dictionary {dict_id}")
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=zdict)
+        else:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        data = decompressor.decompress(value[_HEADER.size:]) + decompressor.flush()
+        return data.decode('utf-8')
+
+    @staticmethod
+    def train_dictionary(samples: Iterable[str], size: int = STOCK_CODEC_DICT_SIZE) -> bytes:
+        """Build a zlib preset dictionary from sample stock content.
+
+        Collects tokens and separators that repeat across samples and packs
+        the most valuable ones (count x length) into ``size`` bytes. zlib
+        matches nearer the end of the dictionary more cheaply, so the best
+        tokens go last.
+        """
+        counts = Counter()
+        for sample in samples:
+            seen = set()
+            for token in _TOKEN_SPLIT.split(sample):
+                if len(token) >= 3 and token not in seen:
+                    seen.add(token)
+                    counts[token] += 1
+
+        ranked = [token for token, count in counts.most_common() if count > 1]
+        ranked.sort(key=lambda token: counts[token] * len(token), reverse=True)
+
+        chosen, used = [], 0
+        for token in ranked:
+            encoded = token.encode('utf-8')
+            if used + len(encoded) > size:
+                continue
+            chosen.append(encoded)
+            used += len(encoded)
+
+        return b''.join(reversed(chosen))
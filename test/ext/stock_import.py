@@ -0,0 +1,546 @@
+import logging
+import asyncio
+import tempfile
+import zipfile
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiohttp
+import discord
+from discord.ext import commands
+
+from .constants import (
+    MAX_STOCK_FILE_SIZE,
+    MAX_STOCK_UNCOMPRESSED_SIZE,
+    MAX_STOCK_ZIP_MEMBERS,
+    VALID_STOCK_FORMATS,
+    STOCK_STREAM_CHUNK_SIZE,
+    STOCK_MAX_LINE_LENGTH,
+    STOCK_IMPORT_PROGRESS_INTERVAL,
+    IMPORT_QUEUED,
+    IMPORT_RUNNING,
+    IMPORT_COMPLETED,
+    IMPORT_FAILED,
+    IMPORT_CANCELLED,
+    OUTBOUND_BOARD
+)
+from .outbound import OutboundDispatcher
+from .product_manager import ProductManagerService
+from .stock_validation import describe_rule
+from database import get_connection
+
+def detect_stock_format(filename: str) -> str:
+    """Return the stock upload format ('txt', 'txt.gz' or 'zip') for a filename"""
+    name = filename.lower()
+    for fmt in sorted(VALID_STOCK_FORMATS, key=len, reverse=True):
+        if name.endswith(f".{fmt}"):
+            return fmt
+    if name.endswith('.gz'):
+        return 'txt.gz'
+    raise ValueError(f"Invalid file format! Supported formats: {', '.join(VALID_STOCK_FORMATS)}")
+
+class StockFileReader:
+    """Streams stock lines out of a Discord attachment without loading it whole.
+
+    The attachment is downloaded in ``chunk_size`` pieces, decompressed and
+    split incrementally, so memory stays flat whatever the file size.
+    ``.zip`` archives need their central directory, so they are spooled to a
+    temp file on disk first and each member is then streamed the same way.
+    Compressed uploads may expand to at most ``MAX_STOCK_UNCOMPRESSED_SIZE``.
+
+    ``offset`` is the position in the uncompressed stream just past the last
+    line handed out and ``line`` the number of lines up to there; passing
+    them back as ``start_offset``/``start_line`` resumes after that line.
+    Lines must be UTF-8 and at most ``STOCK_MAX_LINE_LENGTH`` bytes; the
+    first one that is not fails the read with its line number. Plain ``.txt`` files resume with an HTTP range request, compressed
+    ones are decompressed from the start and the prefix is discarded.
+    """
+
+    def __init__(self, bot, attachment, chunk_size: int = STOCK_STREAM_CHUNK_SIZE, start_offset: int = 0,
+                 start_line: int = 0):
+        if attachment.size > MAX_STOCK_FILE_SIZE:
+            raise ValueError(f"File too large! Maximum size is {MAX_STOCK_FILE_SIZE / 1024 / 1024:.0f}MB")
+
+        self.bot = bot
+        self.attachment = attachment
+        self.filename = attachment.filename
+        self.size = attachment.size
+        self.format = detect_stock_format(attachment.filename)
+        self.chunk_size = chunk_size
+        self.start_offset = start_offset
+        self.offset = start_offset
+        self.line = start_line
+        self.bytes_read = 0
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the uploaded (compressed) file downloaded so far"""
+        return min(1.0, self.bytes_read / self.size) if self.size else 1.0
+
+    async def _download(self, start: int = 0) -> AsyncIterator[bytes]:
+        session = getattr(self.bot, 'session', None)
+        own_session = session is None or session.closed
+        if own_session:
+            session = aiohttp.ClientSession()
+        try:
+            headers = {'Range': f"bytes={start}-"} if start else None
+            async with session.get(self.attachment.url, headers=headers) as response:
+                response.raise_for_status()
+                skip = 0
+                if start:
+                    if response.status == 206:
+                        self.bytes_read = start
+                    else:
+                        skip = start  # server ignored the range; drop the prefix ourselves
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    self.bytes_read += len(chunk)
+                    if skip:
+                        dropped = min(skip, len(chunk))
+                        chunk = chunk[dropped:]
+                        skip -= dropped
+                    if chunk:
+                        yield chunk
+        finally:
+            if own_session:
+                await session.close()
+
+    async def _gunzip(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        async for chunk in chunks:
+            while chunk:
+                # Bounded output per call, so a highly compressed chunk cannot balloon
+                data = decompressor.decompress(chunk, self.chunk_size)
+                if data:
+                    yield data
+                if decompressor.eof:
+                    # Concatenated gzip members: start over on the leftover bytes
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                else:
+                    chunk = decompressor.unconsumed_tail
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+    async def _unzip(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        with tempfile.TemporaryFile() as spool:
+            async for chunk in chunks:
+                await asyncio.to_thread(spool.write, chunk)
+            await asyncio.to_thread(spool.seek, 0)
+
+            with await asyncio.to_thread(zipfile.ZipFile, spool) as archive:
+                members = [member for member in archive.infolist() if not member.is_dir()]
+                if len(members) > MAX_STOCK_ZIP_MEMBERS:
+                    raise ValueError(f"Too many files in archive! Maximum is {MAX_STOCK_ZIP_MEMBERS}")
+                # Declared sizes can lie; _uncompressed still counts the real bytes
+                self._check_uncompressed(sum(member.file_size for member in members))
+
+                for member in members:
+                    with await asyncio.to_thread(archive.open, member) as source:
+                        while True:
+                            data = await asyncio.to_thread(source.read, self.chunk_size)
+                            if not data:
+                                break
+                            yield data
+                    # Members may not end with a newline; keep their last line separate
+                    yield b'\n'
+
+    @staticmethod
+    def _check_uncompressed(size: int):
+        if size > MAX_STOCK_UNCOMPRESSED_SIZE:
+            raise ValueError(
+                f"File too large once decompressed! Maximum is {MAX_STOCK_UNCOMPRESSED_SIZE / 1024 / 1024:.0f}MB"
+            )
+
+    async def _uncompressed(self) -> AsyncIterator[bytes]:
+        if self.format == 'txt':
+            async for chunk in self._download(self.start_offset):
+                yield chunk
+            return
+
+        chunks = self._gunzip(self._download()) if self.format == 'txt.gz' else self._unzip(self._download())
+        skip = self.start_offset
+        total = 0
+        async for chunk in chunks:
+            total += len(chunk)
+            self._check_uncompressed(total)
+            if skip:
+                dropped = min(skip, len(chunk))
+                chunk = chunk[dropped:]
+                skip -= dropped
+            if chunk:
+                yield chunk
+
+    @staticmethod
+    def _decode_line(raw: bytes, first: bool, number: int) -> str:
+        if len(raw) > STOCK_MAX_LINE_LENGTH:
+            raise ValueError(f"Line {number:,} is longer than {STOCK_MAX_LINE_LENGTH:,} bytes")
+        if first and raw.startswith(b'\xef\xbb\xbf'):
+            raw = raw[3:]
+        try:
+            return raw.decode('utf-8').strip()
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Line {number:,} is not valid UTF-8 (byte {e.start + 1})") from None
+
+    async def lines(self) -> AsyncIterator[str]:
+        """Yield every non-empty, stripped line of the file"""
+        position = self.start_offset
+        number = self.line
+        pending = bytearray()
+        async for chunk in self._uncompressed():
+            # Only the new chunk is scanned; a partial line waits in ``pending``
+            start = 0
+            while True:
+                end = chunk.find(b'\n', start)
+                if end == -1:
+                    pending += chunk[start:]
+                    if len(pending) > STOCK_MAX_LINE_LENGTH:
+                        raise ValueError(f"Line {number + 1:,} is longer than {STOCK_MAX_LINE_LENGTH:,} bytes")
+                    break
+                if pending:
+                    pending += chunk[start:end]
+                    raw = bytes(pending)
+                    pending.clear()
+                else:
+                    raw = chunk[start:end]
+                start = end + 1
+                number += 1
+                line = self._decode_line(raw, position == 0, number)
+                position += len(raw) + 1
+                if line:
+                    self.offset, self.line = position, number
+                    yield line
+        if pending:
+            number += 1
+            line = self._decode_line(pending, position == 0, number)
+            position += len(pending)
+            if line:
+                self.offset, self.line = position, number
+                yield line
+        self.offset, self.line = position, number
+
+class StockImportManager:
+    """Runs ``!addstock`` uploads as background jobs persisted in stock_import_jobs.
+
+    After every committed chunk the job row records the reader offset and
+    running counts, so a job interrupted by a restart picks up after the
+    last committed line. Lines from a chunk that was in flight are re-read
+    and land as duplicates rather than twice. Each job edits one status
+    message on a timer instead of per chunk.
+    """
+    _instance = None
+
+    def __new__(cls, bot):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self, bot):
+        if not self.initialized:
+            self.bot = bot
+            self.logger = logging.getLogger("StockImportManager")
+            self.product_service = ProductManagerService(bot)
+            self.outbound = OutboundDispatcher(bot)
+            self.progress_interval = STOCK_IMPORT_PROGRESS_INTERVAL
+            self._tasks: Dict[int, asyncio.Task] = {}
+            self._cancelling = set()
+            self.initialized = True
+
+    async def create_job(self, product_code: str, message: discord.Message, added_by: str,
+                         status_message: Optional[discord.Message] = None) -> int:
+        """Record an import job for the first attachment of ``message``"""
+        attachment = message.attachments[0]
+        detect_stock_format(attachment.filename)
+        if attachment.size > MAX_STOCK_FILE_SIZE:
+            raise ValueError(f"File too large! Maximum size is {MAX_STOCK_FILE_SIZE / 1024 / 1024:.0f}MB")
+
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO stock_import_jobs
+                (product_code, filename, added_by, channel_id, message_id, status_message_id, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                product_code, attachment.filename, added_by, str(message.channel.id), str(message.id),
+                str(status_message.id) if status_message else None, IMPORT_QUEUED
+            ))
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            if conn:
+                conn.close()
+
+    async def get_job(self, job_id: int) -> Optional[Dict]:
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM stock_import_jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        finally:
+            if conn:
+                conn.close()
+
+    async def list_jobs(self, limit: int = 10) -> List[Dict]:
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM stock_import_jobs ORDER BY id DESC LIMIT ?", (limit,))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            if conn:
+                conn.close()
+
+    def _update_job(self, job_id: int, **fields):
+        conn = None
+        try:
+            conn = get_connection()
+            assignments = ', '.join(f"{field} = ?" for field in fields)
+            conn.execute(
+                f"UPDATE stock_import_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+            conn.commit()
+        finally:
+            if conn:
+                conn.close()
+
+    def start_job(self, job_id: int, attachment: Optional[discord.Attachment] = None):
+        """Run a job in the background; ``attachment`` skips re-fetching the upload"""
+        if job_id in self._tasks and not self._tasks[job_id].done():
+            return
+        task = asyncio.create_task(self._run_job(job_id, attachment))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def resume_jobs(self) -> int:
+        """Restart every job that was queued or running when the bot stopped"""
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id FROM stock_import_jobs WHERE status IN (?, ?) ORDER BY id",
+                (IMPORT_QUEUED, IMPORT_RUNNING)
+            )
+            job_ids = [row['id'] for row in cursor.fetchall()]
+        finally:
+            if conn:
+                conn.close()
+
+        for job_id in job_ids:
+            self.start_job(job_id)
+        if job_ids:
+            self.logger.info(f"Resuming {len(job_ids)} stock import jobs")
+        return len(job_ids)
+
+    async def cancel_job(self, job_id: int) -> bool:
+        """Stop a job; chunks committed so far stay in stock"""
+        job = await self.get_job(job_id)
+        if not job or job['status'] not in (IMPORT_QUEUED, IMPORT_RUNNING):
+            return False
+
+        task = self._tasks.get(job_id)
+        if task and not task.done():
+            self._cancelling.add(job_id)
+            task.cancel()
+        else:
+            self._update_job(job_id, status=IMPORT_CANCELLED)
+        return True
+
+    async def shutdown(self):
+        """Stop running jobs without marking them, so they resume on next start"""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _get_channel(self, channel_id: str):
+        channel = self.bot.get_channel(int(channel_id))
+        if channel is None:
+            channel = await self.bot.fetch_channel(int(channel_id))
+        return channel
+
+    async def _get_attachment(self, job: Dict) -> discord.Attachment:
+        # Attachment URLs expire, so re-read the original message for a fresh one
+        channel = await self._get_channel(job['channel_id'])
+        message = await channel.fetch_message(int(job['message_id']))
+        if not message.attachments:
+            raise ValueError("The upload message no longer has an attachment")
+        return message.attachments[0]
+
+    def _status_text(self, job: Dict, reader: Optional[StockFileReader], state: Dict) -> str:
+        text = (
+            f"⏳ Import #{job['id']} ({job['product_code']}, {job['filename']}): "
+            f"{state['total']:,} items, {state['inserted']:,} added, {state['duplicates']:,} duplicates"
+        )
+        if state['rejected'] or state['quarantined']:
+            text += f", {state['rejected']:,} rejected, {state['quarantined']:,} quarantined"
+        if reader:
+            text += f" ({reader.progress:.0%} of file)"
+        return text
+
+    async def _report_progress(self, status_message, job: Dict, reader: StockFileReader, state: Dict):
+        last = None
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            text = self._status_text(job, reader, state)
+            if text != last:
+                try:
+                    await self.outbound.submit(
+                        f"channel:{status_message.channel.id}",
+                        lambda: status_message.edit(content=text),
+                        OUTBOUND_BOARD,
+                        key=f"edit:{status_message.id}"
+                    )
+                    last = text
+                except discord.HTTPException as e:
+                    self.logger.warning(f"Could not update status for import #{job['id']}: {e}")
+
+    async def _finish_message(self, status_message, job: Dict, state: Dict, status: str,
+                              error: str = None, rule_counts: Optional[Dict[int, int]] = None):
+        if status_message is None:
+            return
+        colors = {
+            IMPORT_COMPLETED: discord.Color.green(),
+            IMPORT_CANCELLED: discord.Color.orange(),
+            IMPORT_FAILED: discord.Color.red()
+        }
+        titles = {
+            IMPORT_COMPLETED: "✅ Stock Added",
+            IMPORT_CANCELLED: "⚠️ Stock Import Cancelled",
+            IMPORT_FAILED: "❌ Stock Import Failed"
+        }
+        embed = discord.Embed(title=titles[status], color=colors[status], timestamp=datetime.utcnow())
+        embed.add_field(name="Job", value=f"#{job['id']} ({job['filename']})", inline=False)
+        embed.add_field(name="Product", value=job['product_code'], inline=False)
+        embed.add_field(name="Total Items", value=state['total'], inline=True)
+        embed.add_field(name="Added", value=state['inserted'], inline=True)
+        embed.add_field(name="Duplicates", value=state['duplicates'], inline=True)
+        if state['rejected'] or state['quarantined']:
+            embed.add_field(name="Rejected", value=state['rejected'], inline=True)
+            embed.add_field(name="Quarantined", value=state['quarantined'], inline=True)
+        if rule_counts:
+            rules = {rule['id']: rule for rule in await self.product_service.get_validation_rules(job['product_code'])}
+            lines = [
+                f"{describe_rule(rules[rule_id]) if rule_id in rules else f'#{rule_id}'}: {count:,}"
+                for rule_id, count in rule_counts.items() if count
+            ]
+            if lines:
+                embed.add_field(name="Rule Failures", value="\n".join(lines)[:1024], inline=False)
+        if error:
+            embed.add_field(name="Error", value=error[:1000], inline=False)
+        try:
+            await self.outbound.submit(
+                f"channel:{status_message.channel.id}",
+                lambda: status_message.edit(content=None, embed=embed),
+                OUTBOUND_BOARD,
+                key=f"edit:{status_message.id}"
+            )
+        except discord.HTTPException as e:
+            self.logger.warning(f"Could not post result for import #{job['id']}: {e}")
+
+    async def _run_job(self, job_id: int, attachment: Optional[discord.Attachment] = None):
+        job = await self.get_job(job_id)
+        if not job or job['status'] not in (IMPORT_QUEUED, IMPORT_RUNNING):
+            return
+
+        state = {key: job[key] for key in ('total', 'inserted', 'duplicates', 'rejected', 'quarantined')}
+        status_message = None
+        reporter = None
+        try:
+            if job['status_message_id']:
+                channel = await self._get_channel(job['channel_id'])
+                status_message = channel.get_partial_message(int(job['status_message_id']))
+
+            if attachment is None:
+                attachment = await self._get_attachment(job)
+            reader = StockFileReader(
+                self.bot, attachment, start_offset=job['byte_offset'], start_line=job['line_offset']
+            )
+            self._update_job(job_id, status=IMPORT_RUNNING)
+
+            base = dict(state)
+
+            async def save_progress(stats: Dict):
+                for key in state:
+                    state[key] = base[key] + stats[key]
+                self._update_job(job_id, byte_offset=reader.offset, line_offset=reader.line, **state)
+
+            if status_message is not None:
+                reporter = asyncio.create_task(self._report_progress(status_message, job, reader, state))
+
+            result = await self.product_service.add_stock_bulk(
+                job['product_code'],
+                reader.lines(),
+                job['added_by'],
+                progress_callback=save_progress
+            )
+
+            self._update_job(
+                job_id, status=IMPORT_COMPLETED, byte_offset=reader.offset, line_offset=reader.line, **state
+            )
+            self.logger.info(
+                f"Import #{job_id} for {job['product_code']} finished: "
+                f"{state['inserted']} added, {state['duplicates']} duplicates"
+            )
+            if reporter:
+                reporter.cancel()
+            await self._finish_message(status_message, job, state, IMPORT_COMPLETED, rule_counts=result['rules'])
+
+        except asyncio.CancelledError:
+            if job_id in self._cancelling:
+                self._cancelling.discard(job_id)
+                self._update_job(job_id, status=IMPORT_CANCELLED)
+                self.logger.info(f"Import #{job_id} cancelled after {state['total']} items")
+                if reporter:
+                    reporter.cancel()
+                await self._finish_message(status_message, job, state, IMPORT_CANCELLED)
+            raise
+        except Exception as e:
+            self.logger.error(f"Import #{job_id} failed: {e}")
+            self._update_job(job_id, status=IMPORT_FAILED, error=str(e))
+            if reporter:
+                reporter.cancel()
+            await self._finish_message(status_message, job, state, IMPORT_FAILED, str(e))
+        finally:
+            if reporter:
+                reporter.cancel()
+
+class StockImportCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.import_manager = StockImportManager(bot)
+        self.logger = logging.getLogger("StockImportCog")
+        self._resume_task = None
+
+    async def cog_load(self):
+        """Resume interrupted imports once the bot can reach Discord"""
+        self._resume_task = asyncio.create_task(self._resume_when_ready())
+        self.logger.info("StockImportCog loading...")
+
+    async def cog_unload(self):
+        if self._resume_task:
+            self._resume_task.cancel()
+        await self.import_manager.shutdown()
+        self.logger.info("StockImportCog unloaded")
+
+    async def _resume_when_ready(self):
+        await self.bot.wait_until_ready()
+        try:
+            await self.import_manager.resume_jobs()
+        except Exception as e:
+            self.logger.error(f"Error resuming stock imports: {e}")
+
+async def setup(bot):
+    """Setup the StockImport cog"""
+    if not hasattr(bot, 'stock_import_cog_loaded'):
+        await bot.add_cog(StockImportCog(bot))
+        bot.stock_import_cog_loaded = True
+        logging.info(f'StockImport cog loaded successfully at {datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")} UTC')
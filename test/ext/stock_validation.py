@@ -0,0 +1,105 @@
+import re
+from collections import Counter
+from typing import Dict, List
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+from .constants import RULE_REGEX, RULE_FIELDS, RULE_ACTION_QUARANTINE
+
+def describe_rule(rule: Dict) -> str:
+    """Short human-readable label for a validation rule row"""
+    low, high = rule['min_value'], rule['max_value']
+    bounds = f"{low if low is not None else 0}-{high if high is not None else '∞'}"
+    if rule['rule_type'] == RULE_REGEX:
+        text = f"regex `{rule['pattern']}`"
+    elif rule['rule_type'] == RULE_FIELDS:
+        text = f"{bounds} fields split by `{rule['separator']}`"
+    else:
+        text = f"length {bounds}"
+    return f"#{rule['id']} {text} ({rule['action']})"
+
+class StockValidator:
+    """Checks batches of stock lines against a product's validation rules.
+
+    Each rule is evaluated over the whole batch at once: as pandas string
+    operations when pandas is installed and the batch is large enough,
+    otherwise with precompiled patterns. A line failing any rule is
+    quarantined if one of its failed rules says so, else rejected.
+    """
+
+    PANDAS_MIN_BATCH = 1000
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = rules
+        self._patterns = {
+            rule['id']: re.compile(rule['pattern'])
+            for rule in rules if rule['rule_type'] == RULE_REGEX
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    @staticmethod
+    def _in_bounds(value: int, rule: Dict) -> bool:
+        if rule['min_value'] is not None and value < rule['min_value']:
+            return False
+        if rule['max_value'] is not None and value > rule['max_value']:
+            return False
+        return True
+
+    def _check_python(self, rule: Dict, lines: List[str]) -> List[bool]:
+        if rule['rule_type'] == RULE_REGEX:
+            match = self._patterns[rule['id']].fullmatch
+            return [match(line) is not None for line in lines]
+        if rule['rule_type'] == RULE_FIELDS:
+            separator = rule['separator']
+            return [self._in_bounds(line.count(separator) + 1, rule) for line in lines]
+        return [self._in_bounds(len(line), rule) for line in lines]
+
+    def _check_pandas(self, rule: Dict, series) -> List[bool]:
+        if rule['rule_type'] == RULE_REGEX:
+            passed = series.str.fullmatch(self._patterns[rule['id']])
+        else:
+            if rule['rule_type'] == RULE_FIELDS:
+                values = series.str.count(re.escape(rule['separator'])) + 1
+            else:
+                values = series.str.len()
+            passed = values.notna()
+            if rule['min_value'] is not None:
+                passed &= values >= rule['min_value']
+            if rule['max_value'] is not None:
+                passed &= values <= rule['max_value']
+        return passed.tolist()
+
+    def validate(self, lines: List[str]) -> Dict:
+        """Split a batch into valid, rejected and quarantined lines.
+
+        Returns ``valid`` and ``rejected`` line lists, ``quarantined`` as
+        (line, rule_id, reason) tuples and per-rule failure ``counts``.
+        """
+        result = {'valid': [], 'rejected': [], 'quarantined': [], 'counts': Counter()}
+        if not self.rules:
+            result['valid'] = list(lines)
+            return result
+
+        series = pd.Series(lines, dtype=object) if pd is not None and len(lines) >= self.PANDAS_MIN_BATCH else None
+        checks = []
+        for rule in self.rules:
+            passed = self._check_python(rule, lines) if series is None else self._check_pandas(rule, series)
+            result['counts'][rule['id']] += passed.count(False)
+            checks.append((rule, passed))
+
+        for index, line in enumerate(lines):
+            failed = [rule for rule, passed in checks if not passed[index]]
+            if not failed:
+                result['valid'].append(line)
+                continue
+            quarantine = next((rule for rule in failed if rule['action'] == RULE_ACTION_QUARANTINE), None)
+            if quarantine:
+                result['quarantined'].append((line, quarantine['id'], describe_rule(quarantine)))
+            else:
+                result['rejected'].append(line)
+        return result
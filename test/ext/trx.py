@@ -2,13 +2,26 @@ import logging
 import asyncio
 import time
 import io
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
 from datetime import datetime
 
 import discord
 from discord.ext import commands
 
-from .constants import STATUS_AVAILABLE, STATUS_SOLD, TransactionError
+from .constants import (
+    STATUS_AVAILABLE,
+    STATUS_SOLD,
+    TRANSACTION_PURCHASE,
+    TRANSACTION_REFUND,
+    REFUND_CHUNK_SIZE,
+    EXPORT_FETCH_SIZE,
+    OUTBOUND_INTERACTIVE,
+    TransactionError
+)
+from .admission import PurchaseAdmissionController
+from .outbound import OutboundDispatcher
+from .balance_manager import BalanceManagerService
+from .product_manager import ProductManagerService
 from database import get_connection
 
 class TransactionManager:
@@ -27,6 +40,7 @@ class TransactionManager:
             self._cache = {}
             self._cache_timeout = 30
             self._locks = {}
+            self.admission = PurchaseAdmissionController(bot)
             self.initialized = True
 
     async def _get_lock(self, key: str) -> asyncio.Lock:
@@ -34,6 +48,11 @@ class TransactionManager:
             self._locks[key] = asyncio.Lock()
         return self._locks[key]
 
+    def decode_items(self, items: list) -> List[str]:
+        """Plain text of purchased items, decompressing stored content"""
+        codec = ProductManagerService(self.bot).get_stock_codec()
+        return [codec.decode(item['content']) for item in items]
+
     async def send_purchase_result(self, user: discord.User, items: list, product_name: str) -> bool:
         try:
             # Create txt file content
@@ -43,8 +62,8 @@ class TransactionManager:
             content += "-" * 50 + "\n\n"
             
             # Add all purchased items
-            for idx, item in enumerate(items, 1):
-                content += f"Item {idx}:\n{item['content']}\n\n"
+            for idx, item_content in enumerate(self.decode_items(items), 1):
+                content += f"Item {idx}:\n{item_content}\n\n"
             
             # Create txt file
             file = discord.File(
@@ -52,10 +71,11 @@ class TransactionManager:
                 filename=f"result_{user.name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.txt"
             )
             
-            # Send DM to user
-            await user.send(
-                "Here is your purchase result:",
-                file=file
+            # Send DM to user; receipts go ahead of logs and broadcasts
+            await OutboundDispatcher(self.bot).submit(
+                f"dm:{user.id}",
+                lambda: user.send("Here is your purchase result:", file=file),
+                OUTBOUND_INTERACTIVE
             )
             self.logger.info(f"Purchase result sent to user {user.name} ({user.id})")
             return True
@@ -67,7 +87,17 @@ class TransactionManager:
             self.logger.error(f"Error sending purchase result to {user.name} ({user.id}): {e}")
             return False
 
-    async def process_purchase(self, growid: str, product_code: str, quantity: int = 1) -> Optional[Dict]:
+    async def process_purchase(self, growid: str, product_code: str, quantity: int = 1,
+                               on_queued: Optional[Callable[[int], Awaitable[None]]] = None) -> Optional[Dict]:
+        """Buy stock through the product's admission queue.
+
+        ``on_queued`` is awaited with the buyer's queue position if the
+        product is busy; raises AdmissionError subclasses when not admitted.
+        """
+        async with self.admission.admit(product_code, on_queued=on_queued):
+            return await self._execute_purchase(growid, product_code, quantity)
+
+    async def _execute_purchase(self, growid: str, product_code: str, quantity: int) -> Dict:
         async with await self._get_lock(f"purchase_{growid}_{product_code}"):
             conn = None
             try:
@@ -96,6 +126,8 @@ class TransactionManager:
                 
                 stock_items = cursor.fetchall()
                 if len(stock_items) < quantity:
+                    if not stock_items:
+                        self.admission.mark_sold_out(product_code)
                     raise TransactionError(f"Insufficient stock for {product_code}")
                 
                 # Get user balance - case-sensitive
@@ -142,11 +174,30 @@ class TransactionManager:
                         total_price
                     )
                 )
+                transaction_id = cursor.lastrowid
+                
+                # Link the transaction to the exact stock rows it sold
+                cursor.executemany(
+                    "INSERT INTO purchase_items (transaction_id, stock_id, product_code) VALUES (?, ?, ?)",
+                    [(transaction_id, stock_id, product_code) for stock_id in stock_ids]
+                )
+                
+                # Check whether this purchase emptied the product
+                cursor.execute(
+                    "SELECT EXISTS(SELECT 1 FROM stock WHERE product_code = ? AND status = ?) as has_stock",
+                    (product_code, STATUS_AVAILABLE)
+                )
+                sold_out = not cursor.fetchone()['has_stock']
                 
                 conn.commit()
+                ProductManagerService(self.bot).invalidate_stock_cache(product_code)
+                
+                if sold_out:
+                    self.admission.mark_sold_out(product_code)
                 
                 return {
                     'success': True,
+                    'transaction_id': transaction_id,
                     'items': [dict(item) for item in stock_items],
                     'total_price': total_price,
                     'new_balance': new_balance,
@@ -162,23 +213,58 @@ class TransactionManager:
                 if conn:
                     conn.close()
 
-    # New method: Get user purchase history
-    async def get_user_purchases(self, growid: str, limit: int = 10) -> List[Dict]:
+    async def get_user_purchases(self, growid: str, limit: int = 10, before_id: Optional[int] = None) -> List[Dict]:
+        """Page through a user's purchases, newest first.
+
+        Each purchase carries the exact items it sold. Pass the last returned
+        ``id`` as ``before_id`` to fetch the next page.
+        """
+        conn = None
         try:
             conn = get_connection()
             cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT t.*, s.content, p.name as product_name
-                FROM transactions t
-                JOIN stock s ON s.buyer_id = t.growid
-                JOIN products p ON p.code = s.product_code
-                WHERE t.growid = ? AND t.type = 'PURCHASE'
-                ORDER BY t.created_at DESC
-                LIMIT ?
-            """, (growid, limit))
+            query = """
+                SELECT * FROM transactions
+                WHERE growid = ? AND type = 'PURCHASE'
+            """
+            params = [growid]
+            if before_id is not None:
+                query += " AND id < ?"
+                params.append(before_id)
+            query += " ORDER BY id DESC LIMIT ?"
+            params.append(limit)
             
-            return [dict(row) for row in cursor.fetchall()]
+            cursor.execute(query, params)
+            purchases = [dict(row) for row in cursor.fetchall()]
+            if not purchases:
+                return []
+            
+            by_id = {purchase['id']: purchase for purchase in purchases}
+            for purchase in purchases:
+                purchase['items'] = []
+                purchase['product_name'] = None
+            
+            cursor.execute(f"""
+                SELECT pi.transaction_id, pi.stock_id, pi.product_code, s.content, p.name as product_name
+                FROM purchase_items pi
+                JOIN stock_all s ON s.id = pi.stock_id
+                LEFT JOIN products p ON p.code = pi.product_code
+                WHERE pi.transaction_id IN ({','.join('?' * len(by_id))})
+                ORDER BY pi.transaction_id, pi.stock_id
+            """, list(by_id))
+            
+            codec = ProductManagerService(self.bot).get_stock_codec()
+            for row in cursor.fetchall():
+                purchase = by_id[row['transaction_id']]
+                purchase['items'].append({
+                    'stock_id': row['stock_id'],
+                    'product_code': row['product_code'],
+                    'content': codec.decode(row['content'])
+                })
+                purchase['product_name'] = purchase['product_name'] or row['product_name']
+            
+            return purchases
 
         except Exception as e:
             self.logger.error(f"Error getting user purchases: {e}")
@@ -187,68 +273,241 @@ class TransactionManager:
             if conn:
                 conn.close()
 
-    # New method: Cancel transaction (refund)
-    async def cancel_transaction(self, transaction_id: int, admin_id: str) -> bool:
-        async with await self._get_lock(f"cancel_transaction_{transaction_id}"):
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Get transaction details
-                cursor.execute("""
-                    SELECT t.*, s.id as stock_id
-                    FROM transactions t
-                    JOIN stock s ON s.buyer_id = t.growid
-                    WHERE t.id = ? AND t.type = 'PURCHASE'
-                """, (transaction_id,))
-                
-                trx = cursor.fetchone()
-                if not trx:
-                    raise ValueError(f"Transaction {transaction_id} not found")
-                
-                # Restore stock status
-                cursor.execute(
-                    "UPDATE stock SET status = ?, buyer_id = NULL WHERE id = ?",
-                    (STATUS_AVAILABLE, trx['stock_id'])
-                )
-                
-                # Restore user balance
-                cursor.execute(
-                    "UPDATE users SET balance_wl = balance_wl + ? WHERE growid = ?",
-                    (trx['total_price'], trx['growid'])
-                )
+    def _refundable_query(self, product_code: Optional[str] = None, start: Optional[str] = None,
+                          end: Optional[str] = None, transaction_ids: Optional[List[int]] = None):
+        query = """
+            SELECT t.id, t.growid, t.total_price, t.items_count
+            FROM transactions t
+            WHERE t.type = ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM transactions r
+                  WHERE r.related_transaction_id = t.id AND r.type = ?
+              )
+        """
+        params = [TRANSACTION_PURCHASE, TRANSACTION_REFUND]
+        if transaction_ids is not None:
+            query += f" AND t.id IN ({','.join('?' * len(transaction_ids))})"
+            params.extend(transaction_ids)
+        if start:
+            query += " AND t.created_at >= ?"
+            params.append(start)
+        if end:
+            query += " AND t.created_at < ?"
+            params.append(end)
+        if product_code:
+            # Purchases made before purchase_items existed only carry the code in details
+            query += """
+              AND (
+                  EXISTS (SELECT 1 FROM purchase_items pi WHERE pi.transaction_id = t.id AND pi.product_code = ?)
+                  OR t.details = 'Purchased ' || t.items_count || ' ' || ?
+              )
+            """
+            params.extend([product_code, product_code])
+        query += " ORDER BY t.id"
+        return query, params
+
+    async def find_refundable_purchases(self, product_code: Optional[str] = None, start: Optional[str] = None,
+                                        end: Optional[str] = None,
+                                        transaction_ids: Optional[List[int]] = None) -> List[Dict]:
+        """Purchases matching the filters that have not been refunded yet.
+
+        ``start``/``end`` are UTC timestamps (``YYYY-MM-DD HH:MM:SS``), end exclusive.
+        """
+        if transaction_ids is not None and not transaction_ids:
+            return []
+
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            
+            if transaction_ids is None:
+                cursor.execute(*self._refundable_query(product_code, start, end))
+                return [dict(row) for row in cursor.fetchall()]
+            
+            found = []
+            for i in range(0, len(transaction_ids), REFUND_CHUNK_SIZE):
+                chunk = transaction_ids[i:i + REFUND_CHUNK_SIZE]
+                cursor.execute(*self._refundable_query(product_code, start, end, chunk))
+                found.extend(dict(row) for row in cursor.fetchall())
+            return found
+
+        finally:
+            if conn:
+                conn.close()
+
+    def _refund_chunk(self, cursor, transaction_ids: List[int], admin_id: str) -> Dict:
+        """Refund a chunk of purchases inside the caller's write transaction"""
+        # Re-check under the write lock so concurrent refunds can't double credit
+        cursor.execute(*self._refundable_query(transaction_ids=transaction_ids))
+        purchases = cursor.fetchall()
+        empty = {'refunded': 0, 'items_restored': 0, 'amount': 0, 'growids': set(), 'products': set(),
+                 'missing_users': set()}
+        if not purchases:
+            return empty
+        
+        # Only buyers that still have an account can be credited; leave the rest untouched
+        growids = sorted({row['growid'] for row in purchases})
+        cursor.execute(
+            f"SELECT growid, balance_wl FROM users WHERE growid IN ({','.join('?' * len(growids))})",
+            growids
+        )
+        balances = {row['growid']: row['balance_wl'] for row in cursor.fetchall()}
+        missing_users = {row['growid'] for row in purchases if row['growid'] not in balances}
+        if missing_users:
+            purchases = [row for row in purchases if row['growid'] in balances]
+            if not purchases:
+                return {**empty, 'missing_users': missing_users}
+        
+        ids = [row['id'] for row in purchases]
+        placeholders = ','.join('?' * len(ids))
+        
+        # Restore exactly the stock rows each order sold
+        cursor.execute(
+            f"SELECT transaction_id, stock_id, product_code FROM purchase_items WHERE transaction_id IN ({placeholders})",
+            ids
+        )
+        links = cursor.fetchall()
+        items_per_trx = {}
+        for link in links:
+            items_per_trx[link['transaction_id']] = items_per_trx.get(link['transaction_id'], 0) + 1
+        
+        items_restored = 0
+        if links:
+            # Sold rows may already have been archived; bring them back first
+            stock_ids = [link['stock_id'] for link in links]
+            columns = "id, product_code, content, content_hash, status, added_by, buyer_id, seller_id, added_at, updated_at"
+            for i in range(0, len(stock_ids), 900):
+                chunk = stock_ids[i:i + 900]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO stock ({columns})
+                    SELECT {columns} FROM stock_archive a
+                    WHERE a.id IN ({placeholders})
+                      AND EXISTS (SELECT 1 FROM products p WHERE p.code = a.product_code)
+                """, chunk)
+                cursor.execute(f"""
+                    DELETE FROM stock_archive
+                    WHERE id IN ({placeholders}) AND id IN (SELECT id FROM stock)
+                """, chunk)
+            
+            cursor.executemany(
+                "UPDATE stock SET status = ?, buyer_id = NULL WHERE id = ? AND status = ?",
+                [(STATUS_AVAILABLE, link['stock_id'], STATUS_SOLD) for link in links]
+            )
+            items_restored = cursor.rowcount
+        
+        # Credit balances, keeping a running balance per user for the refund records
+        records = []
+        for purchase in purchases:
+            old_balance = balances[purchase['growid']]
+            balances[purchase['growid']] = old_balance + purchase['total_price']
+            records.append((
+                purchase['growid'],
+                TRANSACTION_REFUND,
+                f"Refund for transaction #{purchase['id']}",
+                f"{old_balance} WL",
+                f"{old_balance + purchase['total_price']} WL",
+                items_per_trx.get(purchase['id'], 0),
+                purchase['total_price'],
+                purchase['id'],
+                admin_id
+            ))
+        
+        cursor.executemany(
+            "UPDATE users SET balance_wl = ? WHERE growid = ?",
+            [(balance, growid) for growid, balance in balances.items()]
+        )
+        cursor.executemany(
+            """
+            INSERT INTO transactions 
+            (growid, type, details, old_balance, new_balance, items_count, total_price, related_transaction_id, admin_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            records
+        )
+        
+        return {
+            'refunded': len(records),
+            'items_restored': items_restored,
+            'amount': sum(record[6] for record in records),
+            'growids': set(balances),
+            'products': {link['product_code'] for link in links},
+            'missing_users': missing_users
+        }
+
+    async def bulk_refund(self, admin_id: str, product_code: Optional[str] = None, start: Optional[str] = None,
+                          end: Optional[str] = None, transaction_ids: Optional[List[int]] = None,
+                          chunk_size: int = REFUND_CHUNK_SIZE,
+                          progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None) -> Dict:
+        """Refund every unrefunded purchase matching the filters.
+
+        Works in chunks of ``chunk_size`` purchases, one database transaction
+        per chunk. ``progress_callback(done, total)`` is awaited after each chunk.
+        Purchases whose buyer no longer has an account are left untouched and
+        their growids listed in ``missing_users``.
+        """
+        async with await self._get_lock("refunds"):
+            purchases = await self.find_refundable_purchases(product_code, start, end, transaction_ids)
+            total = len(purchases)
+            summary = {'requested': total, 'refunded': 0, 'items_restored': 0, 'amount': 0}
+            growids, products, missing_users = set(), set(), set()
+            
+            for i in range(0, total, chunk_size):
+                chunk = [purchase['id'] for purchase in purchases[i:i + chunk_size]]
+                conn = None
+                try:
+                    conn = get_connection()
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    result = self._refund_chunk(cursor, chunk, admin_id)
+                    conn.commit()
+                except Exception as e:
+                    self.logger.error(f"Error refunding transactions {chunk[0]}-{chunk[-1]}: {e}")
+                    if conn:
+                        conn.rollback()
+                    raise
+                finally:
+                    if conn:
+                        conn.close()
                 
-                # Record refund transaction
-                cursor.execute(
-                    """
-                    INSERT INTO transactions 
-                    (growid, type, details, old_balance, new_balance, related_transaction_id, admin_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        trx['growid'],
-                        'REFUND',
-                        f"Refund for transaction #{transaction_id}",
-                        f"{trx['new_balance']} WL",
-                        f"{trx['new_balance'] + trx['total_price']} WL",
-                        transaction_id,
-                        admin_id
-                    )
-                )
+                summary['refunded'] += result['refunded']
+                summary['items_restored'] += result['items_restored']
+                summary['amount'] += result['amount']
+                growids |= result['growids']
+                products |= result['products']
+                missing_users |= result['missing_users']
                 
-                conn.commit()
-                self.logger.info(f"Transaction {transaction_id} cancelled by admin {admin_id}")
-                return True
+                if progress_callback:
+                    await progress_callback(min(i + chunk_size, total), total)
+            
+            # Refunded stock is sellable again and balances changed underneath the caches
+            product_service = ProductManagerService(self.bot)
+            for code in products:
+                product_service.invalidate_stock_cache(code)
+                self.admission.mark_available(code)
+            balance_service = BalanceManagerService(self.bot)
+            for growid in growids:
+                balance_service.invalidate_cache(growid)
+            
+            summary['skipped'] = summary['requested'] - summary['refunded']
+            summary['products'] = sorted(products)
+            summary['missing_users'] = sorted(missing_users)
+            self.logger.info(
+                f"Bulk refund by admin {admin_id}: {summary['refunded']}/{total} purchases, "
+                f"{summary['items_restored']} items restored, {summary['amount']} WL credited"
+            )
+            if missing_users:
+                self.logger.warning(f"Bulk refund skipped purchases of missing users: {', '.join(sorted(missing_users))}")
+            return summary
 
-            except Exception as e:
-                self.logger.error(f"Error cancelling transaction: {e}")
-                if conn:
-                    conn.rollback()
-                raise
-            finally:
-                if conn:
-                    conn.close()
+    async def cancel_transaction(self, transaction_id: int, admin_id: str) -> bool:
+        """Refund a single purchase"""
+        result = await self.bulk_refund(admin_id, transaction_ids=[transaction_id])
+        if not result['refunded']:
+            raise ValueError(f"Transaction {transaction_id} not found or already refunded")
+        self.logger.info(f"Transaction {transaction_id} cancelled by admin {admin_id}")
+        return True
 
     async def get_transaction_history(self, growid: str, limit: int = 10) -> List[Dict]:
         try:
@@ -271,19 +530,62 @@ class TransactionManager:
             if conn:
                 conn.close()
 
+    TRANSACTION_EXPORT_COLUMNS = ('id', 'growid', 'type', 'details', 'old_balance', 'new_balance',
+                                  'items_count', 'total_price', 'related_transaction_id',
+                                  'related_growid', 'admin_id', 'created_at')
+
+    def iter_transaction_export(self, start: Optional[str] = None, end: Optional[str] = None,
+                                fetch_size: int = EXPORT_FETCH_SIZE) -> Iterator[tuple]:
+        """Yield transactions created in [start, end) in TRANSACTION_EXPORT_COLUMNS order.
+
+        Blocking; iterate it off the event loop.
+        """
+        conditions, params = [], []
+        if start:
+            conditions.append("created_at >= ?")
+            params.append(start)
+        if end:
+            conditions.append("created_at < ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {', '.join(self.TRANSACTION_EXPORT_COLUMNS)}
+                FROM transactions
+                {where}
+                ORDER BY id
+            """, params)
+            
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            if conn:
+                conn.close()
+
     async def get_stock_history(self, product_code: str, limit: int = 10) -> List[Dict]:
         try:
             conn = get_connection()
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT * FROM stock 
+                SELECT * FROM stock_all 
                 WHERE product_code = ?
                 ORDER BY updated_at DESC
                 LIMIT ?
             """, (product_code, limit))  # Removed ()
             
-            return [dict(row) for row in cursor.fetchall()]
+            rows = [dict(row) for row in cursor.fetchall()]
+            for row, content in zip(rows, self.decode_items(rows)):
+                row['content'] = content
+            return rows
 
         except Exception as e:
             self.logger.error(f"Error getting stock history: {e}")
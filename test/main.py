@@ -10,6 +10,7 @@ from pathlib import Path
 from database import setup_database, get_connection
 from datetime import datetime
 from utils.command_handler import AdvancedCommandHandler
+from ext.outbound import OutboundDispatcher
 
 # Setup logging dengan file handler
 log_dir = Path('logs')
@@ -124,6 +125,7 @@ class MyBot(commands.Bot):
                 'ext.donate',
                 'ext.balance_manager',
                 'ext.product_manager',
+                'ext.stock_import',
             ]
             
             loaded_extensions = set()  # Track loaded extensions
@@ -147,6 +149,15 @@ class MyBot(commands.Bot):
         """Cleanup when bot shuts down"""
         logger.info("Bot shutting down...")
         try:
+            if self._command_handler_ready:
+                # Keep the analytics gathered since the last timed flush
+                self.command_handler.analytics.flush_loop.cancel()
+                await self.command_handler.analytics.flush()
+                self.command_handler.command_log.flush_loop.cancel()
+                digest = self.command_handler.command_log.flush()
+                if digest:
+                    await asyncio.wait([digest], timeout=5)
+            await OutboundDispatcher(self).shutdown()
             if self.session:
                 await self.session.close()
         except Exception as e:
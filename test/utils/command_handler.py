@@ -1,25 +1,58 @@
-import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import logging
 import json
+from collections import deque
 from datetime import datetime
 from typing import Optional, Dict, List, Tuple
 
+from database import get_connection
+from ext.constants import (
+    ACTIVITY_COMMAND,
+    ANALYTICS_FLUSH_INTERVAL,
+    ANALYTICS_MAX_PENDING,
+    ANALYTICS_ERROR_BUFFER,
+    ANALYTICS_HLL_PRECISION,
+    PERMISSION_RELOAD_INTERVAL
+)
+from .rate_limiter import RateLimiter
+from .cooldowns import get_cooldown_store
+from .hyperloglog import HyperLogLog
+from .command_log import CommandLogAggregator
+from .permissions import PermissionIndex
+
 logger = logging.getLogger(__name__)
 
 class CommandAnalytics:
+    """Command usage and error stats kept in fixed-size structures.
+
+    Per command there is a use counter, HyperLogLog estimates of distinct
+    users and channels, hourly counts and a ring buffer of recent errors.
+    Uses are also buffered per user and command and written to
+    ``user_activity`` in batches by ``flush``, which runs on a timer. Only
+    users with a registered GrowID are written, as ``user_activity``
+    references ``user_growid``.
+    """
+
     def __init__(self):
         self.usage_stats = {}
         self.error_stats = {}
-        
+        self.logger = logging.getLogger("CommandAnalytics")
+        self._pending: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+    def _pending_entry(self, user_id, command: str) -> Dict[str, int]:
+        key = (str(user_id), command)
+        if key not in self._pending:
+            self._pending[key] = {'count': 0, 'errors': 0}
+        return self._pending[key]
+
     async def track_command(self, ctx, command: str):
         now = datetime.utcnow()
         
         if command not in self.usage_stats:
             self.usage_stats[command] = {
                 'total_uses': 0,
-                'users': set(),
-                'channels': set(),
+                'users': HyperLogLog(ANALYTICS_HLL_PRECISION),
+                'channels': HyperLogLog(ANALYTICS_HLL_PRECISION),
                 'last_used': None,
                 'peak_hour_usage': [0] * 24
             }
@@ -31,120 +64,148 @@ class CommandAnalytics:
         stats['last_used'] = now
         stats['peak_hour_usage'][now.hour] += 1
 
-    async def track_error(self, command: str, error: Exception):
+        self._pending_entry(ctx.author.id, command)['count'] += 1
+        if len(self._pending) >= ANALYTICS_MAX_PENDING:
+            await self.flush()
+
+    async def track_error(self, command: str, error: Exception, user_id: Optional[int] = None):
         if command not in self.error_stats:
-            self.error_stats[command] = []
+            self.error_stats[command] = deque(maxlen=ANALYTICS_ERROR_BUFFER)
         
         self.error_stats[command].append({
             'time': datetime.utcnow(),
             'error': str(error),
             'type': type(error).__name__
         })
+        if user_id is not None:
+            self._pending_entry(user_id, command)['errors'] += 1
+
+    @tasks.loop(seconds=ANALYTICS_FLUSH_INTERVAL)
+    async def flush_loop(self):
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Write buffered usage to user_activity; returns the rows written"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.executemany(
+                """
+                INSERT INTO user_activity (discord_id, activity_type, details)
+                SELECT ?, ?, ?
+                WHERE EXISTS (SELECT 1 FROM user_growid WHERE discord_id = ?)
+                """,
+                [
+                    (discord_id, ACTIVITY_COMMAND, json.dumps({'command': command, **counts}), discord_id)
+                    for (discord_id, command), counts in pending.items()
+                ]
+            )
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            self.logger.error(f"Error flushing command analytics: {e}")
+            # Keep the batch for the next flush while there is room for it
+            for key, counts in pending.items():
+                if len(self._pending) >= ANALYTICS_MAX_PENDING:
+                    break
+                entry = self._pending_entry(*key)
+                entry['count'] += counts['count']
+                entry['errors'] += counts['errors']
+            return 0
+        finally:
+            if conn:
+                conn.close()
+
+    def get_history(self, days: int = 7, command: Optional[str] = None) -> List[Dict]:
+        """Uses, errors and distinct users per command from user_activity"""
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            query = """
+                SELECT json_extract(details, '$.command') AS command,
+                       SUM(json_extract(details, '$.count')) AS uses,
+                       SUM(json_extract(details, '$.errors')) AS errors,
+                       COUNT(DISTINCT discord_id) AS users
+                FROM user_activity
+                WHERE activity_type = ? AND created_at >= datetime('now', ?)
+            """
+            params = [ACTIVITY_COMMAND, f"-{int(days)} days"]
+            if command:
+                query += " AND json_extract(details, '$.command') = ?"
+                params.append(command)
+            query += " GROUP BY command ORDER BY uses DESC"
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            if conn:
+                conn.close()
 
 class AdvancedCommandHandler:
     def __init__(self, bot):
         self.bot = bot
         self.analytics = CommandAnalytics()
+        self.analytics.flush_loop.start()
         
         # Load config
         with open('config.json', 'r') as f:
             self.config = json.load(f)
         
-        self.cooldowns = {}
+        self.cooldowns = get_cooldown_store(bot)
         self.custom_cooldowns = self.config.get('cooldowns', {})
-        self.permissions = self.config.get('permissions', {})
-        self.rate_limits = self.config.get('rate_limits', {
-            'global': [5, 5],
-            'user': [3, 5],
-            'channel': [10, 5]
-        })
-        
-        # Rate limit tracking
-        self.rate_usage = {
-            'global': [],
-            'user': {},
-            'channel': {}
-        }
+        self.permission_index = PermissionIndex()
+        self.permission_index.reload(self.config.get('permissions', {}))
+        self.permission_reload_loop.start()
+        bot.add_listener(self.on_member_update, 'on_member_update')
+        bot.add_listener(self.on_member_remove, 'on_member_remove')
+        bot.add_listener(self.on_guild_role_delete, 'on_guild_role_delete')
+        self.rate_limiter = RateLimiter(self.config.get('rate_limits'))
         
         # Setup logging channel
         self.log_channel_id = int(self.config['channels']['logs'])
+        self.command_log = CommandLogAggregator(bot, self.log_channel_id)
+        self.command_log.flush_loop.start()
 
-    async def check_rate_limit(self, ctx) -> bool:
-        now = datetime.utcnow()
-        
-        # Global limit
-        self.rate_usage['global'] = [t for t in self.rate_usage['global'] 
-                                   if (now - t).total_seconds() <= self.rate_limits['global'][1]]
-        if len(self.rate_usage['global']) >= self.rate_limits['global'][0]:
-            return False
-            
-        # User limit
-        user_id = str(ctx.author.id)
-        if user_id not in self.rate_usage['user']:
-            self.rate_usage['user'][user_id] = []
-            
-        self.rate_usage['user'][user_id] = [t for t in self.rate_usage['user'][user_id] 
-                                          if (now - t).total_seconds() <= self.rate_limits['user'][1]]
-        if len(self.rate_usage['user'][user_id]) >= self.rate_limits['user'][0]:
-            return False
-            
-        # Update usage
-        self.rate_usage['global'].append(now)
-        self.rate_usage['user'][user_id].append(now)
-        return True
+    async def check_rate_limit(self, ctx, command: Optional[str] = None) -> bool:
+        allowed, _ = self.rate_limiter.check(ctx.author.id, ctx.channel.id, command)
+        return allowed
 
     async def check_cooldown(self, user_id: int, command: str) -> Tuple[bool, float]:
-        key = f"{user_id}:{command}"
-        now = datetime.utcnow()
-        
-        if key in self.cooldowns:
-            cooldown_time = self.custom_cooldowns.get(command, 
-                                                    self.custom_cooldowns.get('default', 3))
-            elapsed = (now - self.cooldowns[key]).total_seconds()
-            
-            if elapsed < cooldown_time:
-                return False, cooldown_time - elapsed
-                
-        self.cooldowns[key] = now
-        return True, 0
+        cooldown_time = self.custom_cooldowns.get(command, self.custom_cooldowns.get('default', 3))
+        return self.cooldowns.try_acquire(('command', user_id, command), cooldown_time)
 
     async def check_permissions(self, ctx, command: str) -> bool:
         # Admin bypass
-        if str(ctx.author.id) == self.config['admin_id']:
+        if str(ctx.author.id) == str(self.config['admin_id']):
             return True
-            
-        # Get user roles
-        user_roles = [role.id for role in ctx.author.roles]
-        
-        # Check role permissions
-        for role_id in user_roles:
-            role_id = str(role_id)
-            if role_id in self.permissions:
-                perms = self.permissions[role_id]
-                if 'all' in perms or command in perms:
-                    return True
-                    
-        return False
+
+        return self.permission_index.allows(ctx.author, command)
+
+    @tasks.loop(seconds=PERMISSION_RELOAD_INTERVAL)
+    async def permission_reload_loop(self):
+        try:
+            self.permission_index.reload_if_changed()
+        except Exception as e:
+            logger.error(f"Error reloading permissions: {e}")
+
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            self.permission_index.forget_member(after)
+
+    async def on_member_remove(self, member):
+        self.permission_index.forget_member(member)
+
+    async def on_guild_role_delete(self, role):
+        self.permission_index.clear_members()
 
     async def log_command(self, ctx, command: str, success: bool, error: Optional[Exception] = None):
-        channel = self.bot.get_channel(self.log_channel_id)
-        if not channel:
-            return
-            
-        embed = discord.Embed(
-            title="Command Log",
-            timestamp=datetime.utcnow(),
-            color=discord.Color.green() if success else discord.Color.red()
-        )
-        
-        embed.add_field(name="Command", value=command, inline=True)
-        embed.add_field(name="User", value=f"{ctx.author} ({ctx.author.id})", inline=True)
-        embed.add_field(name="Channel", value=f"{ctx.channel} ({ctx.channel.id})", inline=True)
-        
-        if error:
-            embed.add_field(name="Error", value=str(error), inline=False)
-            
-        await channel.send(embed=embed)
+        # Batched into digests; the logs channel no longer gets one embed per command
+        self.command_log.record(ctx, command, success, error)
 
     async def handle_command(self, ctx, command_name: str, *args, **kwargs):
         """Handle command execution with all features"""
@@ -161,7 +222,7 @@ class AdvancedCommandHandler:
             ctx.message._handled = True
             
             # 1. Rate Limit Check
-            if not await self.check_rate_limit(ctx):
+            if not await self.check_rate_limit(ctx, command_name):
                 await ctx.send("🚫 You're sending commands too fast!", delete_after=5)
                 return
                 
@@ -196,13 +257,14 @@ class AdvancedCommandHandler:
                     
             except Exception as cmd_error:
                 logger.error(f"Error executing command {command_name}: {cmd_error}")
+                await self.analytics.track_error(command_name, cmd_error, ctx.author.id)
                 await ctx.send("❌ An error occurred while executing the command!", delete_after=5)
                 await self.log_command(ctx, command_name, False, cmd_error)
                 return
                 
         except Exception as e:
             # 6. Error Handling & Tracking
-            await self.analytics.track_error(command_name, e)
+            await self.analytics.track_error(command_name, e, ctx.author.id)
             await self.log_command(ctx, command_name, False, e)
             
             logger.error(f"Error in command handler: {e}")
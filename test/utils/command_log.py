@@ -0,0 +1,122 @@
+import discord
+from discord.ext import tasks
+import asyncio
+import io
+import json
+import logging
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ext.constants import (
+    OUTBOUND_LOG,
+    COMMAND_LOG_FLUSH_INTERVAL,
+    COMMAND_LOG_MAX_BATCH,
+    COMMAND_LOG_FILE,
+    COMMAND_LOG_FILE_MAX_BYTES,
+    COMMAND_LOG_FILE_BACKUPS
+)
+from ext.outbound import OutboundDispatcher
+
+def _audit_logger() -> logging.Logger:
+    """JSON lines logger for command events, kept out of bot.log"""
+    audit = logging.getLogger("CommandAudit")
+    if not audit.handlers:
+        Path(COMMAND_LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            COMMAND_LOG_FILE, maxBytes=COMMAND_LOG_FILE_MAX_BYTES,
+            backupCount=COMMAND_LOG_FILE_BACKUPS, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        audit.addHandler(handler)
+        audit.setLevel(logging.INFO)
+        audit.propagate = False
+    return audit
+
+class CommandLogAggregator:
+    """Batches command events into digests for the logs channel.
+
+    Every event is written in full to the local JSON lines audit log right
+    away. The channel gets one digest per ``COMMAND_LOG_FLUSH_INTERVAL`` or
+    per ``COMMAND_LOG_MAX_BATCH`` events, whichever comes first; a failed
+    command flushes at once so errors are never held back.
+    """
+
+    def __init__(self, bot, channel_id: int):
+        self.bot = bot
+        self.channel_id = channel_id
+        self.logger = logging.getLogger("CommandLogAggregator")
+        self.audit = _audit_logger()
+        self._buffer: List[Dict] = []
+
+    def record(self, ctx, command: str, success: bool, error: Optional[Exception] = None):
+        event = {
+            'time': datetime.utcnow().isoformat(timespec='seconds'),
+            'command': command,
+            'success': success,
+            'user_id': ctx.author.id,
+            'user': str(ctx.author),
+            'channel_id': ctx.channel.id,
+            'channel': str(ctx.channel),
+            'guild_id': ctx.guild.id if ctx.guild else None
+        }
+        if error:
+            event['error_type'] = type(error).__name__
+            event['error'] = str(error)
+        self.audit.info(json.dumps(event))
+
+        self._buffer.append(event)
+        if not success or len(self._buffer) >= COMMAND_LOG_MAX_BATCH:
+            self.flush()
+
+    @tasks.loop(seconds=COMMAND_LOG_FLUSH_INTERVAL)
+    async def flush_loop(self):
+        self.flush()
+
+    def flush(self) -> Optional[asyncio.Task]:
+        """Queue one digest of the buffered events for the logs channel"""
+        if not self._buffer:
+            return None
+        events, self._buffer = self._buffer, []
+        channel = self.bot.get_channel(self.channel_id)
+        if not channel:
+            return None
+        return OutboundDispatcher(self.bot).send_later(
+            f"channel:{channel.id}", lambda: channel.send(**self._digest(events)), OUTBOUND_LOG
+        )
+
+    @staticmethod
+    def _line(event: Dict) -> str:
+        mark = "✅" if event['success'] else "❌"
+        return (
+            f"`{event['time'][11:]}` {mark} `{event['command']}` "
+            f"{event['user']} ({event['user_id']}) in {event['channel']}"
+        )
+
+    def _digest(self, events: List[Dict]) -> Dict:
+        """Message kwargs for a digest: an embed, plus a file if it does not fit"""
+        errors = [event for event in events if not event['success']]
+        embed = discord.Embed(
+            title=f"Command Log ({len(events)} commands)",
+            timestamp=datetime.utcnow(),
+            color=discord.Color.red() if errors else discord.Color.green()
+        )
+        lines = [self._line(event) for event in events]
+        text = "\n".join(lines)
+        kwargs = {'embed': embed}
+        if len(text) <= 4000:
+            embed.description = text
+        else:
+            embed.description = f"{len(events)} commands, {len(errors)} failed; details attached."
+            kwargs['file'] = discord.File(
+                io.BytesIO(text.encode()),
+                filename=f"commands_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.txt"
+            )
+        for event in errors[:10]:
+            embed.add_field(
+                name=f"Error in {event['command']}",
+                value=f"{event.get('error_type', 'Error')}: {event.get('error', '')}"[:1024],
+                inline=False
+            )
+        return kwargs
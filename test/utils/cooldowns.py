@@ -0,0 +1,62 @@
+import heapq
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+class CooldownStore:
+    """Per-key cooldowns that free their memory as they expire.
+
+    Expiry times live in a dict with a min-heap of (expiry, key) beside it.
+    Every call pops the expired heap entries first, so the dict only ever
+    holds cooldowns that are still running. A heap entry whose expiry no
+    longer matches the dict was superseded and is skipped when popped.
+    """
+
+    def __init__(self):
+        self._expiry: Dict[Hashable, float] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._counter = 0  # tie-breaker so keys never need to be comparable
+
+    def __len__(self) -> int:
+        self.purge()
+        return len(self._expiry)
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """Drop every cooldown that has run out; returns how many"""
+        now = time.monotonic() if now is None else now
+        heap, expiry = self._heap, self._expiry
+        dropped = 0
+        while heap and heap[0][0] <= now:
+            ends, _, key = heapq.heappop(heap)
+            if expiry.get(key) == ends:
+                del expiry[key]
+                dropped += 1
+        return dropped
+
+    def remaining(self, key: Hashable, now: Optional[float] = None) -> float:
+        """Seconds left on ``key``'s cooldown, 0 if none is running"""
+        now = time.monotonic() if now is None else now
+        self.purge(now)
+        ends = self._expiry.get(key)
+        return ends - now if ends is not None else 0.0
+
+    def try_acquire(self, key: Hashable, duration: float, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Start ``key``'s cooldown unless one is running; returns (started, seconds left)"""
+        now = time.monotonic() if now is None else now
+        left = self.remaining(key, now)
+        if left > 0:
+            return False, left
+        ends = now + duration
+        self._expiry[key] = ends
+        self._counter += 1
+        heapq.heappush(self._heap, (ends, self._counter, key))
+        return True, 0.0
+
+    def reset(self, key: Hashable):
+        self._expiry.pop(key, None)
+
+def get_cooldown_store(bot) -> CooldownStore:
+    """The cooldown store shared by commands and live stock buttons"""
+    store = getattr(bot, 'cooldown_store', None)
+    if store is None:
+        store = bot.cooldown_store = CooldownStore()
+    return store
@@ -0,0 +1,43 @@
+import hashlib
+import math
+from typing import Hashable
+
+class HyperLogLog:
+    """Fixed-size estimate of the number of distinct items added.
+
+    ``2 ** precision`` one-byte registers (4KB at the default precision of
+    12) give a standard error of about 1.04 / sqrt(2 ** precision), 1.6%,
+    whatever the number of items.
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self._alpha = 0.7213 / (1 + 1.079 / self.size)
+
+    def add(self, item: Hashable):
+        value = int.from_bytes(hashlib.blake2b(str(item).encode(), digest_size=8).digest(), 'big')
+        index = value >> (64 - self.precision)
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError("cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        estimate = self._alpha * self.size ** 2 / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is more accurate while many registers are empty
+            estimate = self.size * math.log(self.size / zeros)
+        return round(estimate)
+
+    def __len__(self) -> int:
+        return self.count()
@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple, Union
+
+from database import get_connection
+
+PERMISSION_ALL = 'all'
+PERMISSION_CACHE_SIZE = 10_000  # members whose effective permissions are kept
+
+def parse_permissions(value: Union[str, Iterable[str], None]) -> FrozenSet[str]:
+    """Command names from a config list, a JSON list or a comma separated string"""
+    if value is None:
+        return frozenset()
+    if isinstance(value, str):
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            decoded = None
+        value = decoded if isinstance(decoded, list) else value.split(',')
+    return frozenset(str(name).strip().lower() for name in value if str(name).strip())
+
+class PermissionIndex:
+    """Role to command-set index merged from config and ``role_permissions``.
+
+    Built once and rebuilt by ``reload``; a member's effective permissions
+    are the union of their roles' sets, computed on first use and cached
+    until the index or the member's roles change. Rows in the table extend
+    the config for the same role.
+    """
+
+    def __init__(self, config_path: str = 'config.json', cache_size: int = PERMISSION_CACHE_SIZE):
+        self.config_path = config_path
+        self.cache_size = cache_size
+        self.logger = logging.getLogger("PermissionIndex")
+        self.roles: Dict[int, FrozenSet[str]] = {}
+        self.role_ids: FrozenSet[int] = frozenset()
+        self._members: 'OrderedDict[Tuple[int, int], FrozenSet[str]]' = OrderedDict()
+        self._source: Optional[Tuple] = None
+
+    def _read_config(self) -> Dict:
+        with open(self.config_path) as f:
+            return json.load(f).get('permissions', {})
+
+    def _read_table(self) -> Dict[str, str]:
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT role_id, permissions FROM role_permissions")
+            return {row['role_id']: row['permissions'] for row in cursor.fetchall()}
+        finally:
+            if conn:
+                conn.close()
+
+    def _source_version(self) -> Tuple:
+        """What the index was built from: config mtime and the table's last change"""
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*), MAX(updated_at) FROM role_permissions")
+            count, updated = cursor.fetchone()
+        finally:
+            if conn:
+                conn.close()
+        return os.path.getmtime(self.config_path), count, updated
+
+    def reload(self, config_permissions: Optional[Dict] = None):
+        """Rebuild the index and drop every cached member"""
+        source = self._source_version()
+        config_permissions = self._read_config() if config_permissions is None else config_permissions
+        roles: Dict[int, FrozenSet[str]] = {}
+        for origin in (config_permissions, self._read_table()):
+            for role_id, permissions in origin.items():
+                try:
+                    key = int(role_id)
+                except (TypeError, ValueError):
+                    # Only Discord role IDs can match a member's roles
+                    continue
+                roles[key] = roles.get(key, frozenset()) | parse_permissions(permissions)
+        self.roles = roles
+        self.role_ids = frozenset(roles)
+        self._members.clear()
+        self._source = source
+        self.logger.info(f"Permission index loaded: {len(roles)} roles")
+
+    def reload_if_changed(self) -> bool:
+        """Reload when config.json or role_permissions changed since the last build"""
+        if self._source is not None and self._source_version() == self._source:
+            return False
+        self.reload()
+        return True
+
+    def member_permissions(self, member) -> FrozenSet[str]:
+        guild = getattr(member, 'guild', None)
+        key = (guild.id if guild else 0, member.id)
+        permissions = self._members.get(key)
+        if permissions is not None:
+            self._members.move_to_end(key)
+            return permissions
+
+        matched = self.role_ids.intersection(role.id for role in getattr(member, 'roles', ()))
+        permissions = frozenset().union(*(self.roles[role_id] for role_id in matched))
+        self._members[key] = permissions
+        if len(self._members) > self.cache_size:
+            self._members.popitem(last=False)
+        return permissions
+
+    def allows(self, member, command: str) -> bool:
+        return not self.member_permissions(member).isdisjoint((PERMISSION_ALL, command.lower()))
+
+    def forget_member(self, member):
+        guild = getattr(member, 'guild', None)
+        self._members.pop((guild.id if guild else 0, member.id), None)
+
+    def clear_members(self):
+        self._members.clear()
+
+    @property
+    def cached_members(self) -> int:
+        return len(self._members)
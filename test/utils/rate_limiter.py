@@ -0,0 +1,122 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+DEFAULT_RATE_LIMITS = {
+    'global': [5, 5],
+    'user': [3, 5],
+    'channel': [10, 5]
+}
+MAX_TRACKED_KEYS = 100_000  # per scope; the least recently used key goes first past this
+
+class TokenBucket:
+    """Token bucket refilled continuously from the monotonic clock.
+
+    ``rate`` tokens per ``per`` seconds, holding at most ``rate``; the same
+    burst and average as allowing ``rate`` calls in any ``per`` second window.
+    """
+    __slots__ = ('capacity', 'fill_rate', 'tokens', 'updated')
+
+    def __init__(self, rate: int, per: float, now: Optional[float] = None):
+        self.capacity = rate
+        self.fill_rate = rate / per
+        self.tokens = float(rate)
+        self.updated = time.monotonic() if now is None else now
+
+    def available(self, now: float) -> float:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+            self.updated = now
+        return self.tokens
+
+    def take(self, now: float, tokens: float = 1):
+        self.available(now)
+        self.tokens -= tokens
+
+    def wait_time(self, now: float, reserve: float = 0.0) -> float:
+        """Seconds until a token is free above ``reserve``"""
+        return max(0.0, (reserve + 1 - self.available(now)) / self.fill_rate)
+
+    def full_at(self) -> float:
+        """Monotonic time at which the bucket is full again if left alone"""
+        return self.updated + (self.capacity - self.tokens) / self.fill_rate
+
+class KeyedBuckets:
+    """One token bucket per key, forgetting keys that have gone idle.
+
+    A full bucket behaves exactly like a fresh one, so a key is dropped once
+    its bucket has refilled. Keys are kept in last-use order and swept from
+    the front on every access, which keeps memory proportional to the keys
+    active within one refill period at O(1) amortised cost.
+    """
+
+    def __init__(self, rate: int, per: float, max_keys: int = MAX_TRACKED_KEYS):
+        self.rate = rate
+        self.per = per
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[Hashable, TokenBucket]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def get(self, key: Hashable, now: float) -> TokenBucket:
+        self.expire(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.per, now)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def expire(self, now: float) -> int:
+        """Drop refilled buckets from the least recently used end"""
+        dropped = 0
+        buckets = self._buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if bucket.full_at() > now:
+                break
+            del buckets[key]
+            dropped += 1
+        return dropped
+
+class RateLimiter:
+    """Global, per-user, per-channel and per-command limits for commands.
+
+    ``limits`` uses the ``rate_limits`` config shape: ``[count, seconds]``
+    for ``global``, ``user`` and ``channel``, plus an optional ``commands``
+    mapping of command name to ``[count, seconds]`` shared by all users.
+    A call is only counted against any limit when every limit allows it.
+    """
+
+    def __init__(self, limits: Optional[Dict] = None, max_keys: int = MAX_TRACKED_KEYS):
+        limits = {**DEFAULT_RATE_LIMITS, **(limits or {})}
+        self.global_bucket = TokenBucket(*limits['global'])
+        self.users = KeyedBuckets(*limits['user'], max_keys=max_keys)
+        self.channels = KeyedBuckets(*limits['channel'], max_keys=max_keys)
+        self.commands = {
+            name: TokenBucket(*limit) for name, limit in limits.get('commands', {}).items()
+        }
+
+    def check(self, user_id: Hashable, channel_id: Optional[Hashable] = None,
+              command: Optional[str] = None, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Count one call if allowed; returns (allowed, seconds until it would be)"""
+        now = time.monotonic() if now is None else now
+        buckets: List[TokenBucket] = [self.global_bucket, self.users.get(user_id, now)]
+        if channel_id is not None:
+            buckets.append(self.channels.get(channel_id, now))
+        if command in self.commands:
+            buckets.append(self.commands[command])
+
+        retry_after = max(bucket.wait_time(now) for bucket in buckets)
+        if retry_after > 0:
+            return False, retry_after
+        for bucket in buckets:
+            bucket.take(now)
+        return True, 0.0
+
+    def get_stats(self) -> Dict[str, int]:
+        """Number of users and channels currently tracked"""
+        return {'users': len(self.users), 'channels': len(self.channels)}